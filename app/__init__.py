@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
 from flask_cors import CORS
 import os
 
@@ -82,13 +82,8 @@ def create_app(config_name='default'):
     # 健康检查端点（保持向后兼容）
     @app.route('/health')
     def health_check():
-        from app.version import get_full_version_info
-        version_info = get_full_version_info()
-        return {
-            'status': 'healthy',
-            'service': 'AutoCodeReview',
-            'version': version_info['version']
-        }
+        from app.api.version import _health_body
+        return Response(_health_body(), mimetype='application/json')
 
     # Web界面路由
     @app.route('/')
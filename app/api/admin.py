@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify, session
 from app.models.review import ReviewDatabase
 from app.models.auth import AuthDatabase
+from app.utils.current_user import get_current_user, invalidate_user
 from datetime import datetime, timedelta
 import sqlite3
 
@@ -21,7 +22,7 @@ def require_admin():
 
     user_id = session['user_id']
     print(f"Debug - 用户ID: {user_id}")
-    user = auth_db.get_user_by_id(user_id)
+    user = get_current_user(auth_db)
     print(f"Debug - 用户信息: {user}")
     if not user or user.role != 'admin':
         print(f"Debug - 用户不存在或不是管理员, role: {user.role if user else 'None'}")
@@ -43,23 +44,18 @@ def get_admin_statistics():
         conn = sqlite3.connect(auth_db.db_path)
         cursor = conn.cursor()
 
-        # 总用户数
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-
-        # 本周新增用户数
+        # 总用户数、本周新增用户数、总登录次数、月度活跃用户数（根据最后登录时间）在一次扫描中得到
         week_ago = datetime.now() - timedelta(days=7)
-        cursor.execute("SELECT COUNT(*) FROM users WHERE created_at > ?", (week_ago.isoformat(),))
-        new_this_week = cursor.fetchone()[0]
-
-        # 总登录次数
-        cursor.execute("SELECT SUM(login_count) FROM users")
-        total_logins = cursor.fetchone()[0] or 0
-
-        # 月度活跃用户数（根据最后登录时间）
         month_ago_date = (datetime.now() - timedelta(days=30)).date()
-        cursor.execute("SELECT COUNT(*) FROM users WHERE DATE(last_login) >= ?", (month_ago_date,))
-        month_active = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT
+                COUNT(*),
+                COUNT(CASE WHEN created_at > ? THEN 1 END),
+                COALESCE(SUM(login_count), 0),
+                COUNT(CASE WHEN DATE(last_login) >= ? THEN 1 END)
+            FROM users
+        """, (week_ago.isoformat(), month_ago_date.isoformat()))
+        total_users, new_this_week, total_logins, month_active = cursor.fetchone()
 
         conn.close()
 
@@ -324,6 +320,7 @@ def update_user_status(user_id):
             return jsonify({'success': False, 'error': '无效的操作类型'}), 400
 
         if success:
+            invalidate_user(user_id)
             return jsonify({'success': True, 'message': message})
         else:
             return jsonify({'success': False, 'error': '操作失败'}), 500
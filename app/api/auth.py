@@ -5,12 +5,15 @@ import logging
 import re
 
 from ..models.auth import AuthDatabase, User
+from ..models.review import ReviewDatabase
 from ..utils.rate_limiter import rate_limit
+from ..utils.current_user import get_current_user, invalidate_user
 
 bp = Blueprint('auth', __name__)
 
-# 初始化认证数据库
+# 初始化认证数据库；审查数据库实例在管理员接口间共享，避免每次请求重复执行建表和ANALYZE
 auth_db = AuthDatabase()
+review_db = ReviewDatabase()
 logger = logging.getLogger(__name__)
 
 
@@ -152,6 +155,10 @@ def logout():
         if session_token:
             auth_db.invalidate_session(session_token)
 
+        user_id = session.get('user_id')
+        if user_id:
+            invalidate_user(user_id)
+
         session.clear()
 
         return jsonify({
@@ -172,7 +179,7 @@ def get_profile():
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        user = auth_db.get_user_by_id(user_id)
+        user = get_current_user(auth_db)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
 
@@ -277,6 +284,7 @@ def update_profile():
         success = auth_db.update_user_config_partial(user_id, update_fields)
 
         if success:
+            invalidate_user(user_id)
             return jsonify({
                 'success': True,
                 'message': '配置更新成功'
@@ -325,7 +333,7 @@ def get_all_users():
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        current_user = auth_db.get_user_by_id(user_id)
+        current_user = get_current_user(auth_db)
         if not current_user or current_user.role != 'admin':
             return jsonify({'error': '权限不足'}), 403
 
@@ -337,7 +345,7 @@ def get_all_users():
 
         return jsonify({
             'success': True,
-            'users': users,
+            'users': [user._asdict() for user in users],
             'total': total_count,
             'limit': limit,
             'offset': offset
@@ -356,7 +364,7 @@ def update_user_status(target_user_id):
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        current_user = auth_db.get_user_by_id(user_id)
+        current_user = get_current_user(auth_db)
         if not current_user or current_user.role != 'admin':
             return jsonify({'error': '权限不足'}), 403
 
@@ -399,6 +407,7 @@ def update_user_status(target_user_id):
             return jsonify({'error': '无效的操作'}), 400
 
         if success:
+            invalidate_user(target_user_id)
             return jsonify({
                 'success': True,
                 'message': '用户状态更新成功'
@@ -430,7 +439,7 @@ def detect_models():
 
         # 如果使用保存的密钥，从数据库获取
         if use_saved_key or not ai_api_key:
-            user = auth_db.get_user_by_id(user_id)
+            user = get_current_user(auth_db)
             if not user or not user.ai_api_key:
                 return jsonify({'error': '未找到保存的API密钥，请重新输入'}), 400
             ai_api_key = user.ai_api_key
@@ -490,14 +499,10 @@ def get_all_reviews():
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        current_user = auth_db.get_user_by_id(user_id)
+        current_user = get_current_user(auth_db)
         if not current_user or current_user.role != 'admin':
             return jsonify({'error': '权限不足'}), 403
 
-        # 这里需要从review数据库获取所有审查记录
-        from ..models.review import ReviewDatabase
-        review_db = ReviewDatabase()
-
         limit = min(int(request.args.get('limit', 50)), 100)
         offset = int(request.args.get('offset', 0))
 
@@ -526,7 +531,7 @@ def get_admin_review_statistics():
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        current_user = auth_db.get_user_by_id(user_id)
+        current_user = get_current_user(auth_db)
         if not current_user or current_user.role != 'admin':
             return jsonify({'error': '权限不足'}), 403
 
@@ -550,9 +555,6 @@ def get_admin_review_statistics():
             start_date = None
             end_date = None
 
-        from ..models.review import ReviewDatabase
-        review_db = ReviewDatabase()
-
         # 获取基础统计数据
         stats = review_db.get_review_statistics(user_id=None, days=days, start_date=start_date, end_date=end_date)
 
@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify, session, render_template
 from app.models.review import ReviewDatabase
 from app.models.auth import AuthDatabase
+from app.utils.current_user import get_current_user
 from datetime import datetime, timedelta
 import json
 
@@ -32,7 +33,7 @@ def require_login():
     if 'user_id' not in session:
         return False, None
 
-    user = auth_db.get_user_by_id(session['user_id'])
+    user = get_current_user(auth_db)
     if not user:
         return False, None
 
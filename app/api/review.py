@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, request, jsonify, current_app, session
-from typing import Dict, Any
+from flask import Blueprint, request, jsonify, session, Response
+from typing import Dict, Any, Optional, Tuple
+import hashlib
+import json
 import logging
+import re
 import threading
+from datetime import datetime
 
-from ..services.review_service import ReviewService
+from ..services.review_service import ReviewService, TERMINAL_REVIEW_STATUSES
 from ..models.auth import AuthDatabase
 from ..utils.rate_limiter import rate_limit
+from ..utils.current_user import get_current_user, get_user_by_id
 
 bp = Blueprint('review', __name__)
 
@@ -16,41 +21,122 @@ review_service = ReviewService(None)
 auth_db = AuthDatabase()
 logger = logging.getLogger(__name__)
 
+# SSE进度推送无变化时的心跳间隔（秒）
+PROGRESS_STREAM_KEEPALIVE = 15
+# 分页偏移量上限
+MAX_QUERY_OFFSET = 10_000_000
+# 单次批量确认的评论数量上限
+MAX_BULK_CONFIRM = 200
+# 进行中的审查：(用户名, MR URL) -> review_id，None表示记录正在创建
+# 用于合并用户重复点击产生的重复审查（仅在单进程内生效）
+_inflight_reviews: Dict[Tuple[str, str], Optional[int]] = {}
+_inflight_lock = threading.Lock()
+# 固定内容的成功响应体，模块加载时编码一次
+_REVIEW_DELETED_BODY = json.dumps({'success': True, 'message': '审查记录已删除'}).encode('utf-8')
+# 分页上限，在蓝图注册时从应用配置读取一次，避免每次请求访问current_app
+_MAX_PAGE_SIZE = 100
+
+
+@bp.record_once
+def _load_app_config(state):
+    """蓝图注册时缓存应用配置"""
+    global _MAX_PAGE_SIZE
+    _MAX_PAGE_SIZE = state.app.config['MAX_PAGE_SIZE']
+
+
+# 审查失败错误分类表：(匹配规则, 提示模板)，按顺序匹配第一条
+_AI_ERROR_PATTERN = re.compile(r'AI API|OpenAI|Claude')
+_AI_ERROR_RULES = [
+    (re.compile(r'401|Unauthorized'), "AI服务认证失败：API密钥无效或已过期 - {msg}"),
+    (re.compile(r'429|rate limit', re.IGNORECASE), "AI服务请求限制：API请求过于频繁，请稍后重试 - {msg}"),
+    (re.compile(r'timeout', re.IGNORECASE), "AI服务超时：API请求超时，请检查网络连接或稍后重试 - {msg}"),
+    (None, "AI服务错误：{msg}"),
+]
+_ERROR_RULES = [
+    (re.compile(r'GitLab'), "GitLab连接错误：{msg}"),
+    (None, "审查执行失败：{msg}"),
+]
+
+
+def _classify_review_error(error_message: str) -> str:
+    """根据错误信息生成面向用户的错误描述"""
+    rules = _AI_ERROR_RULES if _AI_ERROR_PATTERN.search(error_message) else _ERROR_RULES
+    for pattern, template in rules:
+        if pattern is None or pattern.search(error_message):
+            return template.format(msg=error_message)
+    return error_message
+
+
+def _json_body() -> Optional[Dict]:
+    """解析请求体JSON（不依赖Content-Type，不缓存原始请求体）
+
+    请求体为空时返回空字典，格式错误时返回None
+    """
+    raw = request.get_data(cache=False)
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _clamped_int(name: str, default: int, lo: int, hi: int) -> int:
+    """读取整数查询参数并限制在[lo, hi]范围内，非法值使用默认值"""
+    value = request.args.get(name, default, type=int)
+    return max(lo, min(hi, value))
+
+
+def _progress_etag(progress: Dict) -> str:
+    """根据进度内容生成ETag"""
+    payload = json.dumps(progress, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _record_review_failure(review_id: int, error_message: str):
+    """提交审查失败记录，由ReviewDatabase的后台写线程与其他写操作合并写入（退出时会等待写完）"""
+    review_service.db.queue_review_failure(
+        review_id, error_message, datetime.now().isoformat(),
+        on_commit=review_service.notify_progress_changed
+    )
+
 
 def _perform_review_async(username: str, mr_url: str, review_id: int):
     """异步执行代码审查"""
     try:
-        logger.info(f"Starting async review for review_id: {review_id}")
+        _run_review(username, mr_url, review_id)
+    finally:
+        # 无论成功或失败都将最后一次节流的进度写入数据库
+        try:
+            review_service.flush_review_progress(review_id)
+        except Exception as e:
+            logger.error("Failed to flush progress for review %s: %s", review_id, e)
+        with _inflight_lock:
+            _inflight_reviews.pop((username, mr_url), None)
+
+
+def _run_review(username: str, mr_url: str, review_id: int):
+    """执行审查并记录失败原因"""
+    try:
+        logger.info("Starting async review for review_id: %s", review_id)
         result = review_service.perform_review(username, mr_url, review_id)
 
         # 检查审查结果
         if result and not result.get('success', False):
             error_msg = result.get('error', '未知错误')
-            logger.error(f"Review failed for review_id {review_id}: {error_msg}")
-            review_service.db.fail_review_record(review_id, error_msg)
+            logger.error("Review failed for review_id %s: %s", review_id, error_msg)
+            _record_review_failure(review_id, error_msg)
         else:
-            logger.info(f"Async review completed successfully for review_id: {review_id}")
+            logger.info("Async review completed successfully for review_id: %s", review_id)
 
     except Exception as e:
-        logger.error(f"Error in async review {review_id}: {e}")
+        logger.error("Error in async review %s: %s", review_id, e)
 
         # 根据错误类型提供更详细的错误信息
-        error_message = str(e)
-        if "AI API" in error_message or "OpenAI" in error_message or "Claude" in error_message:
-            if "401" in error_message or "Unauthorized" in error_message:
-                error_message = f"AI服务认证失败：API密钥无效或已过期 - {error_message}"
-            elif "429" in error_message or "rate limit" in error_message.lower():
-                error_message = f"AI服务请求限制：API请求过于频繁，请稍后重试 - {error_message}"
-            elif "timeout" in error_message.lower():
-                error_message = f"AI服务超时：API请求超时，请检查网络连接或稍后重试 - {error_message}"
-            else:
-                error_message = f"AI服务错误：{error_message}"
-        elif "GitLab" in error_message:
-            error_message = f"GitLab连接错误：{error_message}"
-        else:
-            error_message = f"审查执行失败：{error_message}"
+        error_message = _classify_review_error(str(e))
 
-        review_service.db.fail_review_record(review_id, error_message)
+        _record_review_failure(review_id, error_message)
 
 
 @bp.route('/review', methods=['POST'])
@@ -58,22 +144,17 @@ def _perform_review_async(username: str, mr_url: str, review_id: int):
 def start_review():
     """启动代码审查（异步）"""
     try:
-        logger.info("=== Starting review API call ===")
-
         # 检查用户登录状态
         user_id = session.get('user_id')
-        logger.info(f"Session user_id: {user_id}")
         if not user_id:
             return jsonify({'error': '请先登录'}), 401
 
         # 获取当前用户信息
-        user = auth_db.get_user_by_id(user_id)
-        logger.info(f"Found user: {user.username if user else 'None'}")
+        user = get_current_user(auth_db)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
 
-        data = request.get_json()
-        logger.info(f"Request data: {data}")
+        data = _json_body()
 
         # 验证请求数据
         if not data:
@@ -84,35 +165,50 @@ def start_review():
             return jsonify({'error': '缺少MR URL'}), 400
 
         # 验证MR URL格式
-        logger.info(f"Validating MR URL: {mr_url}")
         is_valid, error_msg = review_service.validate_mr_url(mr_url)
         if not is_valid:
             return jsonify({'error': error_msg}), 400
 
+        # 同一用户对同一MR的审查正在进行时，直接返回已有的review_id
+        inflight_key = (user.username, mr_url)
+        with _inflight_lock:
+            if inflight_key in _inflight_reviews:
+                existing_id = _inflight_reviews[inflight_key]
+                if existing_id is None:
+                    return jsonify({'error': '审查正在启动，请勿重复提交'}), 409
+                return jsonify({
+                    'success': True,
+                    'message': '审查已在进行中',
+                    'review_id': existing_id,
+                    'deduped': True
+                }), 200
+            _inflight_reviews[inflight_key] = None
+
         # 创建审查记录
-        logger.info("Creating review record...")
         try:
             review_id = review_service.create_review_record(user.username, mr_url)
-            logger.info(f"Created review record, got review_id: {review_id}")
-        except ValueError as ve:
-            logger.error(f"Failed to create review record: {ve}")
-            return jsonify({'error': str(ve)}), 400
         except Exception as e:
-            logger.error(f"Unexpected error creating review record: {e}")
+            with _inflight_lock:
+                _inflight_reviews.pop(inflight_key, None)
+            if isinstance(e, ValueError):
+                logger.error("Failed to create review record: %s", e)
+                return jsonify({'error': str(e)}), 400
+            logger.error("Unexpected error creating review record: %s", e)
             return jsonify({'error': f'创建审查记录失败：{str(e)}'}), 500
 
+        with _inflight_lock:
+            _inflight_reviews[inflight_key] = review_id
+
         # 启动后台任务
-        logger.info("Starting background thread...")
         thread = threading.Thread(
             target=_perform_review_async,
             args=(user.username, mr_url, review_id),
             daemon=True
         )
         thread.start()
-        logger.info("Background thread started")
+        logger.info("Review %s started by %s for %s", review_id, user.username, mr_url)
 
         # 立即返回review_id
-        logger.info(f"Returning success response with review_id: {review_id}")
         return jsonify({
             'success': True,
             'message': '审查已启动',
@@ -120,9 +216,7 @@ def start_review():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in start_review: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Error in start_review: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -141,7 +235,7 @@ def get_review_details(review_id: int):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_review_details: {e}")
+        logger.error("Error in get_review_details: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -152,15 +246,12 @@ def delete_review(review_id: int):
         success = review_service.delete_review(review_id)
 
         if success:
-            return jsonify({
-                'success': True,
-                'message': '审查记录已删除'
-            }), 200
+            return Response(_REVIEW_DELETED_BODY, status=200, mimetype='application/json')
         else:
             return jsonify({'error': '删除失败'}), 400
 
     except Exception as e:
-        logger.error(f"Error in delete_review: {e}")
+        logger.error("Error in delete_review: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -169,26 +260,28 @@ def get_reviews():
     """获取审查列表"""
     try:
         user_id = request.args.get('user_id')
-        limit = min(int(request.args.get('limit', 20)), current_app.config['MAX_PAGE_SIZE'])
-        offset = int(request.args.get('offset', 0))
+        limit = _clamped_int('limit', 20, 1, _MAX_PAGE_SIZE)
+        offset = _clamped_int('offset', 0, 0, MAX_QUERY_OFFSET)
 
         if user_id:
             reviews = review_service.get_user_review_history(user_id, limit, offset)
         else:
             return jsonify({'error': '缺少用户ID'}), 400
 
-        return jsonify({
+        response = {
             'success': True,
-            'data': {
-                'reviews': reviews,
-                'limit': limit,
-                'offset': offset,
-                'total': len(reviews)
-            }
-        }), 200
+            'reviews': reviews,
+            'limit': limit,
+            'offset': offset
+        }
+        # 默认返回总数；不需要总数的调用方可传skip_total=1省去额外的COUNT查询
+        if request.args.get('skip_total') != '1':
+            response['total'] = review_service.get_user_review_count(user_id)
+
+        return jsonify(response), 200
 
     except Exception as e:
-        logger.error(f"Error in get_reviews: {e}")
+        logger.error("Error in get_reviews: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -198,7 +291,7 @@ def search_reviews():
     try:
         query = request.args.get('q', '').strip()
         user_id = request.args.get('user_id')
-        limit = min(int(request.args.get('limit', 20)), current_app.config['MAX_PAGE_SIZE'])
+        limit = _clamped_int('limit', 20, 1, _MAX_PAGE_SIZE)
 
         if not query:
             return jsonify({'error': '搜索关键词不能为空'}), 400
@@ -207,15 +300,13 @@ def search_reviews():
 
         return jsonify({
             'success': True,
-            'data': {
-                'results': results,
-                'query': query,
-                'total': len(results)
-            }
+            'results': results,
+            'query': query,
+            'total': len(results)
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in search_reviews: {e}")
+        logger.error("Error in search_reviews: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -224,10 +315,7 @@ def get_statistics():
     """获取审查统计信息"""
     try:
         user_id = request.args.get('user_id')
-        days = int(request.args.get('days', 30))
-
-        # 限制查询范围
-        days = min(days, 365)
+        days = _clamped_int('days', 30, 1, 365)
 
         stats = review_service.get_review_statistics(user_id, days)
 
@@ -237,26 +325,35 @@ def get_statistics():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_statistics: {e}")
+        logger.error("Error in get_statistics: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
 @bp.route('/review/<int:review_id>/export', methods=['GET'])
 def export_review(review_id: int):
-    """导出审查数据"""
+    """导出审查数据（流式输出，问题逐条编码发送）"""
     try:
         export_data = review_service.export_review_data(review_id)
 
         if not export_data:
             return jsonify({'error': '审查记录不存在'}), 404
 
-        return jsonify({
-            'success': True,
-            'data': export_data
-        }), 200
+        review, issues = export_data
+
+        def generate():
+            yield '{"success": true, "data": {"review": '
+            yield json.dumps(review, default=str)
+            yield ', "issues": ['
+            for index, issue in enumerate(issues):
+                if index:
+                    yield ', '
+                yield json.dumps(issue, default=str)
+            yield ']}}'
+
+        return Response(generate(), mimetype='application/json')
 
     except Exception as e:
-        logger.error(f"Error in export_review: {e}")
+        logger.error("Error in export_review: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -264,7 +361,10 @@ def export_review(review_id: int):
 def validate_mr_url():
     """验证MR URL"""
     try:
-        data = request.get_json()
+        data = _json_body()
+        if data is None:
+            return jsonify({'error': '请求数据格式错误'}), 400
+
         mr_url = data.get('mr_url', '').strip()
 
         if not mr_url:
@@ -281,7 +381,7 @@ def validate_mr_url():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in validate_mr_url: {e}")
+        logger.error("Error in validate_mr_url: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -289,13 +389,17 @@ def validate_mr_url():
 def test_gitlab_connection():
     """测试GitLab连接"""
     try:
-        data = request.get_json()
+        data = _json_body()
+        if data is None:
+            return jsonify({'error': '请求数据格式错误'}), 400
+
         user_id = data.get('user_id')
 
         if not user_id:
             return jsonify({'error': '缺少用户ID'}), 400
 
-        user_config = config_manager.load_user_config(user_id)
+        # 用户配置已合并到AuthDatabase，User对象即包含GitLab连接信息
+        user_config = get_user_by_id(auth_db, user_id)
         if not user_config:
             return jsonify({'error': '用户配置不存在'}), 404
 
@@ -310,7 +414,7 @@ def test_gitlab_connection():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in test_gitlab_connection: {e}")
+        logger.error("Error in test_gitlab_connection: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -331,7 +435,7 @@ def get_pending_comments(review_id: int):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_pending_comments: {e}")
+        logger.error("Error in get_pending_comments: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -353,7 +457,7 @@ def get_comment_context(review_id: int, issue_id: int):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_comment_context: {e}")
+        logger.error("Error in get_comment_context: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -364,15 +468,18 @@ def confirm_comment(review_id: int, issue_id: int):
         success = review_service.confirm_comment(review_id, issue_id)
 
         if success:
+            # GitLab发布在后台执行，可通过comment-status接口查询结果
             return jsonify({
                 'success': True,
-                'message': '评论已确认并发布到GitLab'
-            }), 200
+                'message': '评论已确认，正在发布到GitLab',
+                'issue_id': issue_id,
+                'status': 'confirmed'
+            }), 202
         else:
             return jsonify({'error': '确认评论失败'}), 400
 
     except Exception as e:
-        logger.error(f"Error in confirm_comment: {e}")
+        logger.error("Error in confirm_comment: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -380,7 +487,7 @@ def confirm_comment(review_id: int, issue_id: int):
 def reject_comment(review_id: int, issue_id: int):
     """拒绝单个评论"""
     try:
-        success = review_service.reject_comment(issue_id)
+        success = review_service.reject_comment(issue_id, review_id)
 
         if success:
             return jsonify({
@@ -391,7 +498,7 @@ def reject_comment(review_id: int, issue_id: int):
             return jsonify({'error': '拒绝评论失败'}), 400
 
     except Exception as e:
-        logger.error(f"Error in reject_comment: {e}")
+        logger.error("Error in reject_comment: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -399,7 +506,10 @@ def reject_comment(review_id: int, issue_id: int):
 def bulk_confirm_comments(review_id: int):
     """批量确认评论"""
     try:
-        data = request.get_json()
+        data = _json_body()
+        if data is None:
+            return jsonify({'error': '请求数据格式错误'}), 400
+
         issue_ids = data.get('issue_ids', [])
 
         if not issue_ids:
@@ -408,19 +518,42 @@ def bulk_confirm_comments(review_id: int):
         if not isinstance(issue_ids, list):
             return jsonify({'error': '评论ID列表格式错误'}), 400
 
+        if len(issue_ids) > MAX_BULK_CONFIRM:
+            return jsonify({'error': f'单次最多确认 {MAX_BULK_CONFIRM} 条评论'}), 400
+
+        try:
+            issue_ids = [int(issue_id) for issue_id in issue_ids]
+        except (TypeError, ValueError):
+            return jsonify({'error': '评论ID列表格式错误'}), 400
+
         result = review_service.bulk_confirm_comments(review_id, issue_ids)
 
         if result['success']:
             return jsonify({
                 'success': True,
-                'message': f'已确认 {result["confirmed_count"]} 条评论，发布 {result["posted_count"]} 条评论到GitLab',
+                'message': f'已确认 {result["confirmed_count"]} 条评论，{result["queued_count"]} 条评论正在发布到GitLab',
                 'data': result
-            }), 200
+            }), 202
         else:
             return jsonify({'error': result.get('error', '批量确认失败')}), 400
 
     except Exception as e:
-        logger.error(f"Error in bulk_confirm_comments: {e}")
+        logger.error("Error in bulk_confirm_comments: %s", e)
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
+@bp.route('/review/<int:review_id>/comment-status', methods=['GET'])
+def get_comment_status(review_id: int):
+    """获取已确认评论的GitLab发布状态"""
+    try:
+        statuses = review_service.get_comment_statuses(review_id)
+        return jsonify({
+            'success': True,
+            'data': statuses
+        }), 200
+
+    except Exception as e:
+        logger.error("Error in get_comment_status: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -433,13 +566,54 @@ def get_review_progress(review_id: int):
         if progress is None:
             return jsonify({'error': '审查记录不存在'}), 404
 
-        return jsonify({
+        # 进度未变化时返回304，客户端无需重新下载
+        response = jsonify({
             'success': True,
             'data': progress
-        }), 200
+        })
+        response.set_etag(_progress_etag(progress))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    except Exception as e:
+        logger.error("Error in get_review_progress: %s", e)
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
+@bp.route('/review/<int:review_id>/progress/stream', methods=['GET'])
+def stream_review_progress(review_id: int):
+    """以SSE方式推送审查进度，替代前端轮询"""
+    try:
+        if review_service.get_review_progress(review_id) is None:
+            return jsonify({'error': '审查记录不存在'}), 404
+
+        def generate():
+            last_etag = None
+            while True:
+                # 先记录版本号再读取进度，避免漏掉两者之间的更新
+                version = review_service.progress_version
+                progress = review_service.get_review_progress(review_id)
+                if progress is None:
+                    return
+
+                etag = _progress_etag(progress)
+                if etag != last_etag:
+                    last_etag = etag
+                    yield f"data: {json.dumps(progress, ensure_ascii=False, default=str)}\n\n"
+
+                if progress.get('status') in TERMINAL_REVIEW_STATUSES:
+                    return
+
+                if not review_service.wait_for_progress_change(version, PROGRESS_STREAM_KEEPALIVE):
+                    yield ": keepalive\n\n"
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
 
     except Exception as e:
-        logger.error(f"Error in get_review_progress: {e}")
+        logger.error("Error in stream_review_progress: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -471,7 +645,7 @@ def get_review_result(review_id: int):
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_review_result: {e}")
+        logger.error("Error in get_review_result: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -485,7 +659,7 @@ def cancel_review(review_id: int):
             return jsonify({'error': '请先登录'}), 401
 
         # 获取当前用户信息
-        user = auth_db.get_user_by_id(user_id)
+        user = get_current_user(auth_db)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
 
@@ -514,7 +688,7 @@ def cancel_review(review_id: int):
             return jsonify({'error': '取消审查失败'}), 400
 
     except Exception as e:
-        logger.error(f"Error in cancel_review: {e}")
+        logger.error("Error in cancel_review: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
 
 
@@ -526,7 +700,7 @@ def get_system_stats():
         if not user_id:
             return jsonify({'error': '未登录'}), 401
 
-        current_user = auth_db.get_user_by_id(user_id)
+        current_user = get_current_user(auth_db)
         if not current_user or current_user.role != 'admin':
             return jsonify({'error': '权限不足'}), 403
 
@@ -555,5 +729,5 @@ def get_system_stats():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in get_system_stats: {e}")
+        logger.error("Error in get_system_stats: %s", e)
         return jsonify({'error': '服务器内部错误'}), 500
\ No newline at end of file
@@ -1,20 +1,38 @@
 """
 版本信息API
 """
-from flask import Blueprint, jsonify
+import functools
+import json
+from flask import Blueprint, Response, jsonify
 from ..version import get_full_version_info
 
 bp = Blueprint('version', __name__, url_prefix='/api')
 
+
+@functools.lru_cache(maxsize=1)
+def _version_body() -> bytes:
+    """版本信息响应体，进程内不变，只编码一次"""
+    return json.dumps({
+        'success': True,
+        'data': get_full_version_info()
+    }).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=1)
+def _health_body() -> bytes:
+    """健康检查响应体，进程内不变，只编码一次"""
+    return json.dumps({
+        'status': 'healthy',
+        'version': get_full_version_info()['version'],
+        'service': 'AutoCodeReview'
+    }).encode('utf-8')
+
+
 @bp.route('/version', methods=['GET'])
 def get_version():
     """获取版本信息"""
     try:
-        version_info = get_full_version_info()
-        return jsonify({
-            'success': True,
-            'data': version_info
-        })
+        return Response(_version_body(), mimetype='application/json')
     except Exception as e:
         return jsonify({
             'success': False,
@@ -24,9 +42,4 @@ def get_version():
 @bp.route('/health', methods=['GET'])
 def health_check():
     """健康检查端点"""
-    version_info = get_full_version_info()
-    return jsonify({
-        'status': 'healthy',
-        'version': version_info['version'],
-        'service': 'AutoCodeReview'
-    })
\ No newline at end of file
+    return Response(_health_body(), mimetype='application/json')
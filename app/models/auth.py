@@ -1,19 +1,145 @@
 # -*- coding: utf-8 -*-
 import os
+import time
+import atexit
 import sqlite3
-import hashlib
+import threading
 import secrets
+import hashlib
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from collections import namedtuple
+
+from ..utils.db_manager import get_db_manager
+from ..utils.password import hash_password, verify_password, needs_rehash
+from ..utils.cache import TTLCache
+from ..utils.current_user import evict_users
 
 logger = logging.getLogger(__name__)
 
+# 会话令牌 -> User 缓存，所有AuthDatabase实例共享，避免每次请求都查询会话表
+SESSION_CACHE_TTL = 60
+_session_cache = TTLCache(maxsize=10000, ttl=SESSION_CACHE_TTL)
+
+# 过期会话后台清理：每分钟一次，每批最多删除SESSION_CLEANUP_BATCH条
+SESSION_CLEANUP_INTERVAL = 60
+SESSION_CLEANUP_BATCH = 1000
+_session_cleanup_paths = set()
+_session_cleanup_lock = threading.Lock()
+
+# 密码校验成功结果缓存：(存储的哈希, 带进程内随机密钥的密码摘要) -> True
+_verify_cache = TTLCache(maxsize=4096, ttl=30)
+_VERIFY_CACHE_SECRET = secrets.token_bytes(32)
+
+# 按秒缓存的当前时间ISO字符串：(Unix秒, ISO字符串)
+_now_iso_cache = (0, '')
+
+
+def _now_iso() -> str:
+    """当前本地时间的ISO字符串（秒精度），同一秒内复用格式化结果"""
+    global _now_iso_cache
+    second = int(time.time())
+    cached_second, cached_value = _now_iso_cache
+    if cached_second != second:
+        cached_value = datetime.fromtimestamp(second).isoformat()
+        _now_iso_cache = (second, cached_value)
+    return cached_value
+
+
+# 登录信息写入缓冲：(db_path, user_id) -> (last_login, 登录次数增量)，由后台线程定期批量写入
+LOGIN_FLUSH_INTERVAL = 2
+_login_buffer: Dict[Tuple[str, int], Tuple[str, int]] = {}
+_login_buffer_lock = threading.Lock()
+_login_flusher: Optional[threading.Thread] = None
+
+
+def _record_login(db_path: str, user_id: int, login_time: str):
+    """记录一次成功登录，启动后台刷新线程（仅首次）"""
+    global _login_flusher
+    with _login_buffer_lock:
+        _, count = _login_buffer.get((db_path, user_id), (None, 0))
+        _login_buffer[(db_path, user_id)] = (login_time, count + 1)
+
+        if _login_flusher is None:
+            _login_flusher = threading.Thread(target=_login_flush_loop, name='login-flusher', daemon=True)
+            _login_flusher.start()
+            atexit.register(flush_login_updates)
+
+
+def _login_flush_loop():
+    """后台线程：定期写入缓冲的登录信息"""
+    while True:
+        time.sleep(LOGIN_FLUSH_INTERVAL)
+        try:
+            flush_login_updates()
+        except Exception as e:
+            logger.error(f"Failed to flush login updates: {e}")
+
+
+def flush_login_updates():
+    """将缓冲的登录信息按数据库批量写入"""
+    with _login_buffer_lock:
+        if not _login_buffer:
+            return
+        pending = dict(_login_buffer)
+        _login_buffer.clear()
+
+    rows_by_db: Dict[str, List[Tuple[str, int, int]]] = {}
+    for (db_path, user_id), (last_login, count) in pending.items():
+        rows_by_db.setdefault(db_path, []).append((last_login, count, user_id))
+
+    for db_path, rows in rows_by_db.items():
+        with get_db_manager(db_path).get_connection() as conn, conn:
+            conn.executemany('''
+                UPDATE users SET
+                    last_login = ?,
+                    login_count = login_count + ?
+                WHERE id = ?
+            ''', rows)
+        # 提交后清除这些用户的缓存记录，资料接口随即读到新的登录时间和次数
+        evict_users({user_id for _, _, user_id in rows})
+
+
+# 登录和会话校验返回的精简用户信息，调用方需要完整配置时再用get_user_by_id加载
+UserSummary = namedtuple('UserSummary', ('id', 'username', 'email', 'role', 'reviewer_name'))
+_USER_SUMMARY_COLUMNS = ', '.join(f'u.{field}' for field in UserSummary._fields)
+
+# 默认管理员账户不允许停用、降级或删除，作为UPDATE/DELETE的WHERE保护条件
+_NOT_DEFAULT_ADMIN = "NOT (username = 'admin' AND email = 'admin@autocodereview.com')"
+
+# 允许部分更新的用户配置字段，字段名会拼接进SQL，必须经过白名单校验
+_PARTIAL_UPDATE_FIELDS = frozenset({
+    'gitlab_url', 'access_token', 'reviewer_name', 'ai_api_url', 'ai_api_key',
+    'ai_model', 'review_config', 'review_severity_level', 'review_mode'
+})
+
+
+@lru_cache(maxsize=None)
+def _partial_update_sql(fields: Tuple[str, ...]) -> str:
+    """按排序后的字段组合生成并缓存UPDATE语句，相同组合复用同一SQL文本"""
+    return f"UPDATE users SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?"
+
+
+# 管理员用户列表的行结构
+UserListRow = namedtuple('UserListRow', (
+    'id', 'username', 'email', 'role', 'gitlab_url', 'reviewer_name',
+    'is_active', 'created_at', 'last_login', 'login_count'
+))
+
 
 @dataclass
 class User:
     """用户数据类"""
+    # 手工声明__slots__（dataclass的slots参数需要Python 3.10），字段无默认值，与下方字段一一对应
+    __slots__ = (
+        'id', 'username', 'email', 'password_hash', 'role', 'gitlab_url', 'access_token',
+        'reviewer_name', 'ai_api_url', 'ai_api_key', 'ai_model', 'review_config',
+        'review_severity_level', 'review_mode', 'is_active', 'created_at', 'last_login', 'login_count'
+    )
+
     id: int
     username: str
     email: str
@@ -43,6 +169,15 @@ class User:
             'review_severity_level': self.review_severity_level
         }
 
+    @classmethod
+    def from_row(cls, row) -> 'User':
+        """按_USER_COLUMNS的列顺序位置构造，跳过dict和关键字参数绑定"""
+        return cls(*row)
+
+
+# 与User字段顺序一致的列清单，不依赖表中列的物理顺序（迁移添加的列位于表尾）
+_USER_COLUMNS = ', '.join(field.name for field in fields(User))
+
 
 class AuthDatabase:
     """用户认证数据库管理"""
@@ -50,6 +185,9 @@ class AuthDatabase:
     def __init__(self, db_path: str = "temp/auth.db"):
         self.db_path = db_path
         self.init_database()
+        # 同一数据库文件的所有实例共享连接池
+        self.db_manager = get_db_manager(db_path)
+        self._start_session_cleanup()
 
     def init_database(self):
         """初始化数据库表"""
@@ -61,6 +199,38 @@ class AuthDatabase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # 按PRAGMA user_version只执行尚未应用的迁移，已是最新版本时不再探测表结构
+        migrations = (self._create_base_schema, self._migrate_session_storage)
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for target_version, migrate in enumerate(migrations[version:], start=version + 1):
+            migrate(cursor)
+            cursor.execute(f'PRAGMA user_version = {target_version}')
+            conn.commit()
+
+        # 创建默认管理员用户（如果不存在）
+        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
+        admin_count = cursor.fetchone()[0]
+
+        if admin_count == 0:
+            # 创建默认管理员
+            admin_password = self._hash_password("admin123")
+            cursor.execute('''
+                INSERT INTO users (
+                    username, email, password_hash, role, gitlab_url,
+                    access_token, reviewer_name, ai_api_url, ai_api_key, ai_model, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                'admin', 'admin@autocodereview.com', admin_password, 'admin',
+                'https://gitlab.com', 'your-gitlab-token', 'AdminReviewer',
+                'https://api.openai.com/v1', 'your-openai-api-key', 'gpt-3.5-turbo',
+                _now_iso()
+            ))
+
+        conn.commit()
+        conn.close()
+
+    def _create_base_schema(self, cursor):
+        """迁移1：创建用户表和会话表，并为旧数据库补齐新增字段"""
         # 用户表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -85,14 +255,14 @@ class AuthDatabase:
             )
         ''')
 
-        # 会话表
+        # 会话表（时间字段为Unix时间戳）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sessions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
                 session_token TEXT UNIQUE NOT NULL,
-                expires_at TEXT NOT NULL,
-                created_at TEXT NOT NULL,
+                expires_at INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
@@ -110,212 +280,249 @@ class AuthDatabase:
         # 创建索引
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions (session_token)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)')
 
-        # 创建默认管理员用户（如果不存在）
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "admin"')
-        admin_count = cursor.fetchone()[0]
-
-        if admin_count == 0:
-            # 创建默认管理员
-            admin_password = self._hash_password("admin123")
-            cursor.execute('''
-                INSERT INTO users (
-                    username, email, password_hash, role, gitlab_url,
-                    access_token, reviewer_name, ai_api_url, ai_api_key, ai_model, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                'admin', 'admin@autocodereview.com', admin_password, 'admin',
-                'https://gitlab.com', 'your-gitlab-token', 'AdminReviewer',
-                'https://api.openai.com/v1', 'your-openai-api-key', 'gpt-3.5-turbo',
-                datetime.now().isoformat()
-            ))
-
-        conn.commit()
-        conn.close()
+    def _migrate_session_storage(self, cursor):
+        """迁移2：会话时间字段改为INTEGER时间戳，并建立覆盖索引"""
+        self._migrate_session_timestamps(cursor)
+
+        # 会话查询的过滤条件和user_id都可以直接从索引中取得
+        cursor.execute('DROP INDEX IF EXISTS idx_sessions_token')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token_expires ON sessions (session_token, expires_at, user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)')
+
+    def _migrate_session_timestamps(self, cursor):
+        """将旧版本ISO字符串格式的会话时间字段迁移为INTEGER时间戳"""
+        cursor.execute("PRAGMA table_info(sessions)")
+        column_types = {column[1]: column[2] for column in cursor.fetchall()}
+        if column_types.get('expires_at') != 'TEXT':
+            return
+
+        cursor.execute('SELECT id, user_id, session_token, expires_at, created_at FROM sessions')
+        rows = [
+            (row[0], row[1], row[2],
+             int(datetime.fromisoformat(row[3]).timestamp()),
+             int(datetime.fromisoformat(row[4]).timestamp()))
+            for row in cursor.fetchall()
+        ]
+
+        cursor.execute('DROP TABLE sessions')
+        cursor.execute('''
+            CREATE TABLE sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                session_token TEXT UNIQUE NOT NULL,
+                expires_at INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.executemany('''
+            INSERT INTO sessions (id, user_id, session_token, expires_at, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
 
     def _hash_password(self, password: str) -> str:
         """密码哈希"""
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-        return f"{salt}:{password_hash.hex()}"
+        return hash_password(password)
 
     def _verify_password(self, password: str, password_hash: str) -> bool:
         """验证密码"""
+        return verify_password(password, password_hash)
+
+    def _upgrade_password_hash(self, user_id: int, old_hash: str, password: str):
+        """将旧格式的密码哈希升级为当前格式（登录成功后在后台执行）"""
         try:
-            salt, stored_hash = password_hash.split(':')
-            password_hash_check = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-            return stored_hash == password_hash_check.hex()
-        except ValueError:
-            return False
+            new_hash = hash_password(password)
+            with self.db_manager.get_connection() as conn, conn:
+                # 只在哈希未被并发修改（如管理员重置密码）时更新
+                conn.execute(
+                    'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                    (new_hash, user_id, old_hash)
+                )
+        except Exception as e:
+            logger.error(f"Failed to upgrade password hash for user {user_id}: {e}")
 
     def create_user(self, username: str, email: str, password: str,
                    gitlab_url: str = None, access_token: str = None, reviewer_name: str = "AutoCodeReview",
                    ai_api_url: str = "https://api.openai.com/v1", ai_api_key: str = "",
                    ai_model: str = "gpt-3.5-turbo") -> Optional[int]:
         """创建新用户"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            # 为 NOT NULL 字段提供默认值
-            if gitlab_url is None:
-                gitlab_url = ""
-            if access_token is None:
-                access_token = ""
-
-            password_hash = self._hash_password(password)
-            cursor.execute('''
-                INSERT INTO users (
-                    username, email, password_hash, role, gitlab_url,
-                    access_token, reviewer_name, ai_api_url, ai_api_key, ai_model, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                username, email, password_hash, 'user', gitlab_url,
-                access_token, reviewer_name, ai_api_url, ai_api_key, ai_model,
-                datetime.now().isoformat()
-            ))
-
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
-
-        except sqlite3.IntegrityError as e:
-            # 记录详细错误信息以便调试
-            logger.error(f"Failed to create user {username}: {e}")
-            return None
-        finally:
-            conn.close()
-
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
+        # 为 NOT NULL 字段提供默认值
+        if gitlab_url is None:
+            gitlab_url = ""
+        if access_token is None:
+            access_token = ""
+
+        password_hash = self._hash_password(password)
+
+        with self.db_manager.get_connection() as conn:
+            try:
+                with conn:
+                    cursor = conn.execute('''
+                        INSERT INTO users (
+                            username, email, password_hash, role, gitlab_url,
+                            access_token, reviewer_name, ai_api_url, ai_api_key, ai_model, created_at
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        username, email, password_hash, 'user', gitlab_url,
+                        access_token, reviewer_name, ai_api_url, ai_api_key, ai_model,
+                        _now_iso()
+                    ))
+                return cursor.lastrowid
+
+            except sqlite3.IntegrityError as e:
+                # 记录详细错误信息以便调试
+                logger.error(f"Failed to create user {username}: {e}")
+                return None
+
+    def authenticate_user(self, username: str, password: str) -> Optional[UserSummary]:
         """用户认证"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT * FROM users
-            WHERE username = ? AND is_active = 1
-        ''', (username,))
+        with self.db_manager.get_connection() as conn:
+            row = conn.execute(f'''
+                SELECT {_USER_SUMMARY_COLUMNS}, u.password_hash FROM users u
+                WHERE u.username = ? AND u.is_active = 1
+            ''', (username,)).fetchone()
 
-        row = cursor.fetchone()
         if not row:
-            conn.close()
             return None
 
-        user_dict = dict(row)
-        if not self._verify_password(password, user_dict['password_hash']):
-            conn.close()
-            return None
-
-        # 更新登录信息
-        cursor.execute('''
-            UPDATE users SET
-                last_login = ?,
-                login_count = login_count + 1
-            WHERE id = ?
-        ''', (datetime.now().isoformat(), user_dict['id']))
-
-        conn.commit()
-        conn.close()
-
-        return User(**user_dict)
+        # 哈希校验耗时，不占用数据库连接
+        user = UserSummary._make(tuple(row)[:-1])
+        password_hash = row['password_hash']
+        # 短时间内重复登录跳过PBKDF2；key包含存储的哈希，密码变更后自动失效，只缓存成功结果
+        verify_key = (
+            password_hash,
+            hashlib.blake2b(password.encode(), key=_VERIFY_CACHE_SECRET, digest_size=16).digest()
+        )
+        if verify_key not in _verify_cache:
+            if not self._verify_password(password, password_hash):
+                return None
+            _verify_cache.set(verify_key, True)
+
+            if needs_rehash(password_hash):
+                threading.Thread(
+                    target=self._upgrade_password_hash,
+                    args=(user.id, password_hash, password),
+                    daemon=True
+                ).start()
+
+        # 登录信息由后台线程批量写入
+        _record_login(self.db_path, user.id, _now_iso())
+        return user
 
     def create_session(self, user_id: int, expires_hours: int = 24) -> str:
         """创建用户会话"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         session_token = secrets.token_urlsafe(32)
-        expires_at = datetime.now() + timedelta(hours=expires_hours)
+        now = int(time.time())
 
-        cursor.execute('''
-            INSERT INTO sessions (user_id, session_token, expires_at, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, session_token, expires_at.isoformat(), datetime.now().isoformat()))
-
-        conn.commit()
-        conn.close()
+        with self.db_manager.get_connection() as conn, conn:
+            conn.execute('''
+                INSERT INTO sessions (user_id, session_token, expires_at, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, session_token, now + expires_hours * 3600, now))
 
         return session_token
 
-    def get_user_by_session(self, session_token: str) -> Optional[User]:
+    def get_user_by_session(self, session_token: str) -> Optional[UserSummary]:
         """通过会话令牌获取用户"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        user = _session_cache.get(session_token)
+        if user is not None:
+            return user
+
+        now = time.time()
+        with self.db_manager.get_connection() as conn:
+            row = conn.execute(f'''
+                SELECT {_USER_SUMMARY_COLUMNS}, s.expires_at FROM sessions s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.session_token = ?
+                    AND s.expires_at > ?
+                    AND u.is_active = 1
+            ''', (session_token, int(now))).fetchone()
 
-        cursor.execute('''
-            SELECT u.* FROM users u
-            JOIN sessions s ON u.id = s.user_id
-            WHERE s.session_token = ?
-                AND s.expires_at > ?
-                AND u.is_active = 1
-        ''', (session_token, datetime.now().isoformat()))
-
-        row = cursor.fetchone()
-        conn.close()
+        if not row:
+            return None
 
-        if row:
-            return User(**dict(row))
-        return None
+        user = UserSummary._make(tuple(row)[:-1])
+        expires_at = row['expires_at']
+        # 缓存时间不超过会话剩余有效期
+        _session_cache.set(session_token, user, ttl=min(SESSION_CACHE_TTL, expires_at - now))
+        return user
 
     def invalidate_session(self, session_token: str):
         """使会话失效"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
-
-        conn.commit()
-        conn.close()
-
-    def cleanup_expired_sessions(self):
-        """清理过期会话"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DELETE FROM sessions WHERE expires_at < ?', (datetime.now().isoformat(),))
+        _session_cache.pop(session_token)
+        with self.db_manager.get_connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
+            conn.commit()
 
-        conn.commit()
-        conn.close()
+    def _forget_user_sessions(self, user_id: int):
+        """用户信息或状态变化后清除其会话缓存"""
+        _session_cache.pop_values(lambda user: user.id == user_id)
+
+    def cleanup_expired_sessions(self) -> int:
+        """分批清理过期会话，避免长时间持有写锁，返回删除数量"""
+        now = int(time.time())
+        deleted = 0
+        while True:
+            with self.db_manager.get_connection() as conn, conn:
+                cursor = conn.execute('''
+                    DELETE FROM sessions WHERE id IN (
+                        SELECT id FROM sessions WHERE expires_at < ? LIMIT ?
+                    )
+                ''', (now, SESSION_CLEANUP_BATCH))
+            deleted += cursor.rowcount
+            if cursor.rowcount < SESSION_CLEANUP_BATCH:
+                return deleted
+
+    def _start_session_cleanup(self):
+        """为每个数据库文件启动一个后台线程定期清理过期会话"""
+        with _session_cleanup_lock:
+            if self.db_path in _session_cleanup_paths:
+                return
+            _session_cleanup_paths.add(self.db_path)
+
+        threading.Thread(
+            target=self._session_cleanup_loop, name='session-cleanup', daemon=True
+        ).start()
+
+    def _session_cleanup_loop(self):
+        """后台线程：定期清理过期会话"""
+        while True:
+            time.sleep(SESSION_CLEANUP_INTERVAL)
+            try:
+                deleted = self.cleanup_expired_sessions()
+                if deleted:
+                    logger.info(f"Cleaned up {deleted} expired sessions")
+            except Exception as e:
+                logger.error(f"Failed to clean up expired sessions: {e}")
 
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """根据ID获取用户"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM users WHERE id = ? AND is_active = 1', (user_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.db_manager.get_connection() as conn:
+            row = conn.execute(
+                f'SELECT {_USER_COLUMNS} FROM users WHERE id = ? AND is_active = 1', (user_id,)
+            ).fetchone()
 
         if row:
-            return User(**dict(row))
+            return User.from_row(row)
         return None
 
     def get_user_by_username(self, username: str) -> Optional[User]:
         """根据用户名获取用户"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT * FROM users WHERE username = ? AND is_active = 1', (username,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.db_manager.get_connection() as conn:
+            row = conn.execute(
+                f'SELECT {_USER_COLUMNS} FROM users WHERE username = ? AND is_active = 1', (username,)
+            ).fetchone()
 
         if row:
-            return User(**dict(row))
+            return User.from_row(row)
         return None
 
     def update_user_config(self, user_id: int, gitlab_url: str, access_token: str, reviewer_name: str,
                           ai_api_url: str = None, ai_api_key: str = None, ai_model: str = None,
                           review_config: str = None, review_severity_level: str = None, review_mode: str = None) -> bool:
         """更新用户配置"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         # 构建更新字段
         update_fields = ['gitlab_url = ?', 'access_token = ?', 'reviewer_name = ?']
         update_values = [gitlab_url, access_token, reviewer_name]
@@ -346,16 +553,18 @@ class AuthDatabase:
 
         update_values.append(user_id)
 
-        cursor.execute(f'''
-            UPDATE users SET
-                {', '.join(update_fields)}
-            WHERE id = ?
-        ''', update_values)
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute(f'''
+                UPDATE users SET
+                    {', '.join(update_fields)}
+                WHERE id = ?
+            ''', update_values)
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            success = cursor.rowcount > 0
+            conn.commit()
 
+        if success:
+            self._forget_user_sessions(user_id)
         return success
 
     def update_user_config_partial(self, user_id: int, update_fields: Dict) -> bool:
@@ -363,90 +572,74 @@ class AuthDatabase:
         if not update_fields:
             return True  # 没有字段需要更新
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 构建更新字段
-        update_clauses = []
-        update_values = []
-
-        for field, value in update_fields.items():
-            update_clauses.append(f'{field} = ?')
-            update_values.append(value)
+        unknown_fields = update_fields.keys() - _PARTIAL_UPDATE_FIELDS
+        if unknown_fields:
+            raise ValueError(f"Unsupported user config fields: {', '.join(sorted(unknown_fields))}")
 
+        fields = tuple(sorted(update_fields))
+        update_values = [update_fields[field] for field in fields]
         update_values.append(user_id)
 
-        cursor.execute(f'''
-            UPDATE users SET
-                {', '.join(update_clauses)}
-            WHERE id = ?
-        ''', update_values)
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute(_partial_update_sql(fields), update_values)
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            success = cursor.rowcount > 0
+            conn.commit()
 
+        if success:
+            self._forget_user_sessions(user_id)
         return success
 
-    def get_all_users(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+    def get_all_users(self, limit: int = 50, offset: int = 0) -> List[UserListRow]:
         """获取所有用户（管理员功能）"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT id, username, email, role, gitlab_url, reviewer_name,
-                   is_active, created_at, last_login, login_count
-            FROM users
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-
-        rows = cursor.fetchall()
-        conn.close()
-
-        return [dict(row) for row in rows]
+        users = []
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            # 直接返回元组，跳过sqlite3.Row和dict的两次转换
+            cursor.row_factory = None
+            cursor.execute(f'''
+                SELECT {', '.join(UserListRow._fields)}
+                FROM users
+                ORDER BY created_at DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                users.extend(map(UserListRow._make, batch))
+
+        return users
 
     def get_users_count(self) -> int:
         """获取用户总数"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM users')
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        with self.db_manager.get_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
 
     def deactivate_user(self, user_id: int) -> bool:
         """停用用户"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 检查是否是默认管理员账户
-        cursor.execute('SELECT username, email FROM users WHERE id = ?', (user_id,))
-        user_info = cursor.fetchone()
-
-        if user_info and user_info[0] == 'admin' and user_info[1] == 'admin@autocodereview.com':
-            conn.close()
-            return False  # 不允许停用默认管理员
-
-        cursor.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
+        with self.db_manager.get_connection() as conn:
+            # 不允许停用默认管理员，保护条件直接放在WHERE中
+            cursor = conn.execute(
+                f'UPDATE users SET is_active = 0 WHERE id = ? AND {_NOT_DEFAULT_ADMIN}',
+                (user_id,)
+            )
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            success = cursor.rowcount > 0
+            conn.commit()
 
+        if success:
+            self._forget_user_sessions(user_id)
         return success
 
     def activate_user(self, user_id: int) -> bool:
         """激活用户"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute('UPDATE users SET is_active = 1 WHERE id = ?', (user_id,))
 
-        cursor.execute('UPDATE users SET is_active = 1 WHERE id = ?', (user_id,))
-
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            success = cursor.rowcount > 0
+            conn.commit()
 
         return success
 
@@ -455,114 +648,83 @@ class AuthDatabase:
         if new_role not in ['user', 'admin']:
             return False
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 检查是否是默认管理员账户
-        cursor.execute('SELECT username, email, role FROM users WHERE id = ?', (user_id,))
-        user_info = cursor.fetchone()
-
-        if user_info and user_info[0] == 'admin' and user_info[1] == 'admin@autocodereview.com':
-            if new_role != 'admin':
-                conn.close()
-                return False  # 不允许将默认管理员降级为普通用户
+        # 不允许将默认管理员降级为普通用户
+        sql = 'UPDATE users SET role = ? WHERE id = ?'
+        if new_role != 'admin':
+            sql += f' AND {_NOT_DEFAULT_ADMIN}'
 
-        cursor.execute('UPDATE users SET role = ? WHERE id = ?', (new_role, user_id))
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute(sql, (new_role, user_id))
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+            success = cursor.rowcount > 0
+            conn.commit()
 
+        if success:
+            self._forget_user_sessions(user_id)
         return success
 
     def remove_user(self, user_id: int) -> bool:
         """移除用户（软删除或硬删除）"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 检查是否是默认管理员账户
-        cursor.execute('SELECT username, email FROM users WHERE id = ?', (user_id,))
-        user_info = cursor.fetchone()
-        if user_info and user_info[0] == 'admin' and user_info[1] == 'admin@autocodereview.com':
-            conn.close()
-            return False  # 不允许删除默认管理员
-
-        # 删除用户记录（硬删除）
-        # 注意：这里不会删除审查记录，只删除用户账户
-        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
-        success = cursor.rowcount > 0
+        with self.db_manager.get_connection() as conn, conn:
+            # 删除用户记录（硬删除），不允许删除默认管理员
+            # 注意：这里不会删除审查记录，只删除用户账户
+            cursor = conn.execute(
+                f'DELETE FROM users WHERE id = ? AND {_NOT_DEFAULT_ADMIN}',
+                (user_id,)
+            )
+            success = cursor.rowcount > 0
 
-        # 清理相关的会话记录
-        cursor.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+            # 清理相关的会话记录
+            if success:
+                conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
 
-        conn.commit()
-        conn.close()
+        if success:
+            self._forget_user_sessions(user_id)
         return success
 
     def reset_user_password(self, user_id: int, new_password: str) -> bool:
         """重置用户密码"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # 哈希计算耗时，在获取数据库连接之前完成
+        password_hash = self._hash_password(new_password)
 
         try:
-            # 检查用户是否存在
-            cursor.execute('SELECT id FROM users WHERE id = ?', (user_id,))
-            if not cursor.fetchone():
-                return False
-
-            # 生成新密码哈希
-            password_hash = self._hash_password(new_password)
-
-            # 更新密码
-            cursor.execute('''
-                UPDATE users
-                SET password_hash = ?, updated_at = ?
-                WHERE id = ?
-            ''', (password_hash, datetime.now().isoformat(), user_id))
-
-            success = cursor.rowcount > 0
-
-            # 清理该用户的所有会话，强制重新登录
+            with self.db_manager.get_connection() as conn, conn:
+                # 更新密码并清理该用户的所有会话（强制重新登录），在同一事务中完成
+                cursor = conn.execute(
+                    'UPDATE users SET password_hash = ? WHERE id = ?',
+                    (password_hash, user_id)
+                )
+                success = cursor.rowcount > 0
+                if success:
+                    conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
             if success:
-                cursor.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
-
-            conn.commit()
+                self._forget_user_sessions(user_id)
             return success
 
         except Exception as e:
             logger.error(f"Failed to reset password for user {user_id}: {e}")
             return False
-        finally:
-            conn.close()
 
     def get_user_statistics(self) -> Dict:
         """获取用户统计信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 总用户数
-        cursor.execute('SELECT COUNT(*) FROM users WHERE is_active = 1')
-        total_users = cursor.fetchone()[0]
-
-        # 管理员数
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "admin" AND is_active = 1')
-        admin_count = cursor.fetchone()[0]
-
-        # 今日活跃用户
         today = datetime.now().date().isoformat()
-        cursor.execute('SELECT COUNT(*) FROM users WHERE DATE(last_login) = ? AND is_active = 1', (today,))
-        today_active = cursor.fetchone()[0]
-
-        # 本周新注册
         week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        cursor.execute('SELECT COUNT(*) FROM users WHERE created_at > ? AND is_active = 1', (week_ago,))
-        new_this_week = cursor.fetchone()[0]
 
-        conn.close()
+        # 单次扫描用条件聚合得到全部统计
+        with self.db_manager.get_connection() as conn:
+            total_users, admin_count, today_active, new_this_week = conn.execute('''
+                SELECT
+                    COUNT(*),
+                    COUNT(CASE WHEN role = 'admin' THEN 1 END),
+                    COUNT(CASE WHEN DATE(last_login) = ? THEN 1 END),
+                    COUNT(CASE WHEN created_at > ? THEN 1 END)
+                FROM users
+                WHERE is_active = 1
+            ''', (today, week_ago)).fetchone()
 
         return {
             'total_users': total_users,
             'admin_count': admin_count,
             'today_active': today_active,
             'new_this_week': new_this_week
-        }
\ No newline at end of file
+        }
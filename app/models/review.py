@@ -1,14 +1,326 @@
 # -*- coding: utf-8 -*-
 import os
+import queue
+import atexit
+import logging
 import sqlite3
-from typing import Dict, List, Optional
-from datetime import datetime
+import threading
+from concurrent.futures import Future
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+
+from ..utils.cache import TTLCache
+from ..utils.db_manager import get_db_manager, get_read_db_manager
+
+logger = logging.getLogger(__name__)
+
+# 单条语句的绑定参数上限（旧版SQLite的SQLITE_MAX_VARIABLE_NUMBER为999），IN列表超出时分块执行
+MAX_SQL_VARIABLES = 900
+
+_SCHEMA_SQL = '''
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    mr_url TEXT NOT NULL,
+    project_path TEXT NOT NULL,
+    project_id TEXT NOT NULL,
+    mr_iid INTEGER NOT NULL,
+    mr_title TEXT NOT NULL,
+    mr_author TEXT NOT NULL,
+    source_branch TEXT NOT NULL,
+    target_branch TEXT NOT NULL,
+    total_files_analyzed INTEGER DEFAULT 0,
+    total_issues_found INTEGER DEFAULT 0,
+    error_count INTEGER DEFAULT 0,
+    warning_count INTEGER DEFAULT 0,
+    info_count INTEGER DEFAULT 0,
+    comments_posted INTEGER DEFAULT 0,
+    comment_errors_count INTEGER DEFAULT 0,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    status TEXT DEFAULT 'pending',
+    error_message TEXT
+);
+
+-- 问题表
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_id INTEGER NOT NULL,
+    file_path TEXT NOT NULL,
+    line_number INTEGER NOT NULL,
+    severity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    message TEXT NOT NULL,
+    suggestion TEXT,
+    comment_text TEXT NOT NULL,
+    comment_status TEXT DEFAULT 'pending',
+    gitlab_comment_id TEXT,
+    confidence REAL DEFAULT 0.8,
+    created_at TEXT NOT NULL,
+    confirmed_at TEXT,
+    FOREIGN KEY (review_id) REFERENCES reviews (id)
+);
+
+-- 进度表
+CREATE TABLE IF NOT EXISTS review_progress (
+    review_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    total_files INTEGER DEFAULT 0,
+    processed_files INTEGER DEFAULT 0,
+    total_issues INTEGER DEFAULT 0,
+    current_file TEXT,
+    last_update TEXT NOT NULL,
+    FOREIGN KEY (review_id) REFERENCES reviews (id)
+);
+
+-- (user_id, created_at)同时覆盖按用户过滤和按时间排序，单列user_id索引已冗余
+DROP INDEX IF EXISTS idx_reviews_user_id;
+CREATE INDEX IF NOT EXISTS idx_reviews_user_created ON reviews (user_id, created_at);
+-- 按时间范围的趋势和统计聚合只读取该索引（覆盖status、user_id和问题数），不回表；
+-- 按created_at倒序分页时反向扫描同一索引
+DROP INDEX IF EXISTS idx_reviews_created_at;
+CREATE INDEX IF NOT EXISTS idx_reviews_created_cover ON reviews (created_at, status, user_id, total_issues_found);
+CREATE INDEX IF NOT EXISTS idx_reviews_mr_url ON reviews (mr_url, created_at);
+
+-- 复合索引与查询的过滤和排序一致，按审查取问题/待确认评论时无需额外排序；
+-- 两者都以review_id为前缀，原单列索引已冗余
+DROP INDEX IF EXISTS idx_issues_review_id;
+CREATE INDEX IF NOT EXISTS idx_issues_review_order ON issues (review_id, file_path, line_number);
+CREATE INDEX IF NOT EXISTS idx_issues_review_status_order ON issues (review_id, comment_status, file_path, line_number);
+CREATE INDEX IF NOT EXISTS idx_issues_status ON issues (comment_status);
+
+COMMIT;
+'''
+
+# 本地时间的ISO时间戳（毫秒精度），在SQL内生成，与已有的datetime.isoformat()值可按字符串比较
+_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# 高频语句提升为模块常量，长连接的语句缓存按SQL文本命中，复用已编译的语句
+_INSERT_ISSUE_PREFIX = '''
+    INSERT INTO issues (
+        review_id, file_path, line_number, severity, category,
+        message, suggestion, comment_text, confidence, created_at
+    ) VALUES '''
+_ISSUE_VALUES = f'(?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW_SQL})'
+_ISSUE_PARAMS = _ISSUE_VALUES.count('?')
+_INSERT_ISSUE_SQL = _INSERT_ISSUE_PREFIX + _ISSUE_VALUES
+
+# SQLite 3.35起支持RETURNING，批量插入时用多行VALUES一次取回所有新ID
+_RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+_ISSUES_PER_INSERT = MAX_SQL_VARIABLES // _ISSUE_PARAMS
+
+_SELECT_REVIEW_ISSUES_SQL = '''
+    SELECT * FROM issues
+    WHERE review_id = ?
+    ORDER BY file_path, line_number, id
+'''
+
+# 按(file_path, line_number, id)游标分页，沿idx_issues_review_order索引定位，不扫描已返回的行
+_SELECT_REVIEW_ISSUES_PAGE_SQL = '''
+    SELECT * FROM issues
+    WHERE review_id = ? AND (file_path, line_number, id) > (?, ?, ?)
+    ORDER BY file_path, line_number, id
+    LIMIT ?
+'''
+
+_SELECT_REVIEW_SQL = 'SELECT * FROM reviews WHERE id = ?'
+
+# 进度更新每处理一个文件执行一次，进度查询由前端轮询，均为高频语句
+_UPDATE_PROGRESS_SQL = f'''
+    UPDATE review_progress
+    SET status = ?, processed_files = ?, total_issues = ?, current_file = ?, last_update = {_NOW_SQL}
+    WHERE review_id = ?
+'''
+
+_SELECT_PROGRESS_SQL = 'SELECT * FROM review_progress WHERE review_id = ?'
+
+
+# 评论确认状态转换：目标状态 -> 允许的来源状态（发布失败的评论可重新确认）
+_COMMENT_STATUS_SOURCES = {
+    'confirmed': ('pending', 'post_failed'),
+    'rejected': ('pending',),
+}
+
+_COMMENT_STATUS_CONDITION = {
+    new_status: "comment_status IN ({})".format(', '.join(f"'{status}'" for status in sources))
+    for new_status, sources in _COMMENT_STATUS_SOURCES.items()
+}
+
+_SET_COMMENT_STATUS_PREFIX = {
+    new_status: f'''
+        UPDATE issues SET
+            comment_status = '{new_status}',
+            confirmed_at = {_NOW_SQL}
+        WHERE {condition}
+    '''
+    for new_status, condition in _COMMENT_STATUS_CONDITION.items()
+}
+
+_SET_COMMENT_STATUS_SQL = {
+    new_status: prefix + ' AND id = ?'
+    for new_status, prefix in _SET_COMMENT_STATUS_PREFIX.items()
+}
+
+_MARK_COMMENT_POSTED_SQL = '''
+    UPDATE issues SET
+        gitlab_comment_id = ?,
+        comment_status = 'posted'
+    WHERE id = ?
+'''
+
+_MARK_COMMENT_POST_FAILED_SQL = '''
+    UPDATE issues SET comment_status = 'post_failed'
+    WHERE id = ? AND comment_status = 'confirmed'
+'''
+
+_INCREMENT_COMMENTS_POSTED_SQL = '''
+    UPDATE reviews
+    SET comments_posted = comments_posted + ?
+    WHERE id = ?
+'''
+
+# 审查失败在后台写线程中提交，完成时间在入队时记录
+_FAIL_REVIEW_SQL = '''
+    UPDATE reviews SET
+        status = 'failed',
+        error_message = ?,
+        completed_at = ?
+    WHERE id = ?
+'''
+
+# 全表审查总数缓存：db_path -> 行数。SQLite不保存表行数，COUNT(*)需要扫描整个索引；
+# 审查记录只在create_review_record中新增，新增时清除，TTL兜底其他进程的写入
+_reviews_count_cache = TTLCache(maxsize=16, ttl=300)
+
+# 后台写入队列：(db_path, [(sql, params), ...], 提交后回调, Future)，由单个写线程按入队顺序合并为一个事务执行
+WRITE_FLUSH_INTERVAL = 0.05
+WRITE_FLUSH_BATCH = 256
+_write_queue = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _enqueue_write(db_path: str, statements: List[Tuple[str, Tuple]],
+                   on_commit: Optional[Callable] = None) -> Future:
+    """提交一组写操作到后台写线程，返回的Future在提交后完成，失败时携带异常"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_loop, name='review-db-writer', daemon=True)
+                _writer.start()
+                atexit.register(flush_pending_writes)
+    future = Future()
+    _write_queue.put((db_path, statements, on_commit, future))
+    return future
+
+
+def _commit_statements(db_path: str, statements: List[Tuple[str, Tuple]]):
+    """在一个BEGIN IMMEDIATE事务中按入队顺序执行写操作，连续的相同SQL合并为executemany"""
+    with get_db_manager(db_path).get_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        for sql, run in groupby(statements, key=itemgetter(0)):
+            conn.executemany(sql, [params for _, params in run])
+        conn.commit()
+
+
+def _finish_write(item: Tuple, error: Optional[Exception]):
+    """完成一条队列写操作：设置Future结果，仅在提交成功时执行回调"""
+    _, _, on_commit, future = item
+    if error is not None:
+        future.set_exception(error)
+    else:
+        if on_commit is not None:
+            try:
+                on_commit()
+            except Exception as e:
+                logger.error(f"Queued write callback failed: {e}")
+        future.set_result(None)
+    _write_queue.task_done()
+
+
+def _write_loop():
+    """后台线程：在WRITE_FLUSH_INTERVAL内合并写操作，按数据库一次提交；整批失败时逐条重试"""
+    while True:
+        batch = [_write_queue.get()]
+        while len(batch) < WRITE_FLUSH_BATCH:
+            try:
+                batch.append(_write_queue.get(timeout=WRITE_FLUSH_INTERVAL))
+            except queue.Empty:
+                break
+
+        by_db: Dict[str, List[Tuple]] = {}
+        for item in batch:
+            by_db.setdefault(item[0], []).append(item)
+
+        for db_path, items in by_db.items():
+            if len(items) > 1:
+                try:
+                    _commit_statements(db_path, [stmt for item in items for stmt in item[1]])
+                except Exception as e:
+                    logger.warning(f"Batched write of {len(items)} queued updates to {db_path} failed, "
+                                   f"retrying individually: {e}")
+                else:
+                    for item in items:
+                        _finish_write(item, None)
+                    continue
+
+            # 单条写入，或整批回滚后逐条单独提交以隔离出失败的写操作
+            for item in items:
+                try:
+                    _commit_statements(db_path, item[1])
+                except Exception as e:
+                    logger.error(f"Failed to write queued update to {db_path}: {e}")
+                    _finish_write(item, e)
+                else:
+                    _finish_write(item, None)
+
+
+def flush_pending_writes():
+    """阻塞直到后台写队列中已提交的写操作全部完成"""
+    _write_queue.join()
+
+
+def _issue_row(review_id: int, issue_data: Dict) -> Tuple:
+    """将问题数据转换为_INSERT_ISSUE_SQL的参数元组"""
+    return (
+        review_id,
+        issue_data['file_path'],
+        issue_data['line_number'],
+        issue_data['severity'],
+        issue_data['category'],
+        issue_data['message'],
+        issue_data.get('suggestion'),
+        issue_data['comment_text'],
+        issue_data.get('confidence', 0.8)  # 默认值 0.8
+    )
+
+
+def _tuple_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """返回按元组取行的游标，多行查询不必先构造sqlite3.Row再转换为字典"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def _fetch_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """按cursor.description的列名把剩余结果行直接构造为字典"""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
 
 class ReviewDatabase:
     def __init__(self, db_path: str = "temp/reviews.db"):
         self.db_path = db_path
         self.init_database()
+        # 复用共享连接池中的长连接，保留页缓存和已编译语句，避免每次调用都重新打开数据库
+        self.db_manager = get_db_manager(db_path)
+        # 查询走独立的只读连接池，进度轮询等读请求不与写操作争用连接
+        self.read_db_manager = get_read_db_manager(db_path)
 
     def init_database(self):
         # 确保数据库目录存在
@@ -19,55 +331,14 @@ class ReviewDatabase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reviews (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                mr_url TEXT NOT NULL,
-                project_path TEXT NOT NULL,
-                project_id TEXT NOT NULL,
-                mr_iid INTEGER NOT NULL,
-                mr_title TEXT NOT NULL,
-                mr_author TEXT NOT NULL,
-                source_branch TEXT NOT NULL,
-                target_branch TEXT NOT NULL,
-                total_files_analyzed INTEGER DEFAULT 0,
-                total_issues_found INTEGER DEFAULT 0,
-                error_count INTEGER DEFAULT 0,
-                warning_count INTEGER DEFAULT 0,
-                info_count INTEGER DEFAULT 0,
-                comments_posted INTEGER DEFAULT 0,
-                comment_errors_count INTEGER DEFAULT 0,
-                created_at TEXT NOT NULL,
-                completed_at TEXT,
-                status TEXT DEFAULT 'pending',
-                error_message TEXT
-            )
-        ''')
+        # WAL是数据库文件的持久属性，设置一次后所有连接都生效，读操作不再阻塞写操作
+        if self.db_path != ':memory:':
+            cursor.execute('PRAGMA journal_mode=WAL').fetchone()
 
-        # 创建问题表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS issues (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                review_id INTEGER NOT NULL,
-                file_path TEXT NOT NULL,
-                line_number INTEGER NOT NULL,
-                severity TEXT NOT NULL,
-                category TEXT NOT NULL,
-                message TEXT NOT NULL,
-                suggestion TEXT,
-                comment_text TEXT NOT NULL,
-                comment_status TEXT DEFAULT 'pending',
-                gitlab_comment_id TEXT,
-                confidence REAL DEFAULT 0.8,
-                created_at TEXT NOT NULL,
-                confirmed_at TEXT,
-                FOREIGN KEY (review_id) REFERENCES reviews (id)
-            )
-        ''')
+        # 建表和建索引在同一事务中一次执行，冷启动只提交一次
+        cursor.executescript(_SCHEMA_SQL)
 
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_review_id ON issues (review_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_issues_status ON issues (comment_status)')
+        conn.execute('BEGIN')
 
         # 数据库迁移：为现有数据库添加 confidence 字段
         cursor.execute("PRAGMA table_info(issues)")
@@ -75,109 +346,149 @@ class ReviewDatabase:
         if 'confidence' not in columns:
             cursor.execute('ALTER TABLE issues ADD COLUMN confidence REAL DEFAULT 0.8')
 
-        # 创建进度表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS review_progress (
-                review_id INTEGER PRIMARY KEY,
-                status TEXT NOT NULL,
-                total_files INTEGER DEFAULT 0,
-                processed_files INTEGER DEFAULT 0,
-                total_issues INTEGER DEFAULT 0,
-                current_file TEXT,
-                last_update TEXT NOT NULL,
-                FOREIGN KEY (review_id) REFERENCES reviews (id)
-            )
-        ''')
+        self.fts_enabled = self._init_search_index(cursor)
+
+        # 收集索引统计供查询规划器选择索引：首次完整ANALYZE，之后只按需增量更新
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            cursor.execute('ANALYZE')
+        else:
+            cursor.execute('PRAGMA optimize')
 
         conn.commit()
         conn.close()
 
-    def create_review_record(self, review_data: Dict) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _init_search_index(self, cursor) -> bool:
+        """创建审查记录的FTS5全文索引及同步触发器，SQLite不支持FTS5时返回False"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reviews_fts'")
+        exists = cursor.fetchone() is not None
+
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+                    mr_title, mr_author, project_path, source_branch,
+                    content='reviews', content_rowid='id', tokenize='unicode61'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
 
         cursor.execute('''
-            INSERT INTO reviews (
-                user_id, mr_url, project_path, project_id, mr_iid,
-                mr_title, mr_author, source_branch, target_branch,
-                created_at, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            review_data['user_id'], review_data['mr_url'], review_data.get('project_path', ''),
-            review_data.get('project_id', ''), review_data.get('mr_iid', 0),
-            review_data.get('mr_title', ''), review_data.get('mr_author', ''),
-            review_data.get('source_branch', ''), review_data.get('target_branch', ''),
-            datetime.now().isoformat(), 'pending'
-        ))
-
-        review_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+                INSERT INTO reviews_fts (rowid, mr_title, mr_author, project_path, source_branch)
+                VALUES (new.id, new.mr_title, new.mr_author, new.project_path, new.source_branch);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+                INSERT INTO reviews_fts (reviews_fts, rowid, mr_title, mr_author, project_path, source_branch)
+                VALUES ('delete', old.id, old.mr_title, old.mr_author, old.project_path, old.source_branch);
+            END
+        ''')
+        # 只在被索引的列变化时更新，状态/计数更新不触发
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS reviews_fts_update
+            AFTER UPDATE OF mr_title, mr_author, project_path, source_branch ON reviews BEGIN
+                INSERT INTO reviews_fts (reviews_fts, rowid, mr_title, mr_author, project_path, source_branch)
+                VALUES ('delete', old.id, old.mr_title, old.mr_author, old.project_path, old.source_branch);
+                INSERT INTO reviews_fts (rowid, mr_title, mr_author, project_path, source_branch)
+                VALUES (new.id, new.mr_title, new.mr_author, new.project_path, new.source_branch);
+            END
+        ''')
+
+        # 首次创建时为已有记录建立索引
+        if not exists:
+            cursor.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('rebuild')")
+        return True
+
+    def create_review_record(self, review_data: Dict) -> int:
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(f'''
+                INSERT INTO reviews (
+                    user_id, mr_url, project_path, project_id, mr_iid,
+                    mr_title, mr_author, source_branch, target_branch,
+                    created_at, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {_NOW_SQL}, ?)
+            ''', (
+                review_data['user_id'], review_data['mr_url'], review_data.get('project_path', ''),
+                review_data.get('project_id', ''), review_data.get('mr_iid', 0),
+                review_data.get('mr_title', ''), review_data.get('mr_author', ''),
+                review_data.get('source_branch', ''), review_data.get('target_branch', ''),
+                'pending'
+            ))
+
+            review_id = cursor.lastrowid
+            conn.commit()
+        _reviews_count_cache.pop(self.db_path)
         return review_id
 
     def complete_review_record(self, review_id: int, summary: Dict):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """标记审查完成，问题总数和各严重程度数量直接由issues表聚合得到"""
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE reviews SET
-                total_files_analyzed = ?,
-                total_issues_found = ?,
-                error_count = ?,
-                warning_count = ?,
-                info_count = ?,
-                comments_posted = ?,
-                comment_errors_count = ?,
-                completed_at = ?,
-                status = 'completed'
-            WHERE id = ?
-        ''', (
-            summary.get('total_files_analyzed', 0),
-            summary.get('total_issues_found', 0),
-            summary.get('error_count', 0),
-            summary.get('warning_count', 0),
-            summary.get('info_count', 0),
-            summary.get('comments_posted', 0),
-            summary.get('comment_errors_count', 0),
-            datetime.now().isoformat(),
-            review_id
-        ))
+            cursor.execute(f'''
+                UPDATE reviews SET
+                    total_files_analyzed = ?,
+                    total_issues_found = (SELECT COUNT(*) FROM issues WHERE review_id = reviews.id),
+                    error_count = (SELECT COUNT(*) FROM issues
+                                   WHERE review_id = reviews.id AND severity = 'error'),
+                    warning_count = (SELECT COUNT(*) FROM issues
+                                     WHERE review_id = reviews.id AND severity = 'warning'),
+                    info_count = (SELECT COUNT(*) FROM issues
+                                  WHERE review_id = reviews.id AND severity = 'info'),
+                    comments_posted = ?,
+                    comment_errors_count = ?,
+                    completed_at = {_NOW_SQL},
+                    status = 'completed'
+                WHERE id = ?
+            ''', (
+                summary.get('total_files_analyzed', 0),
+                summary.get('comments_posted', 0),
+                summary.get('comment_errors_count', 0),
+                review_id
+            ))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def fail_review_record(self, review_id: int, error_message: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE reviews SET
-                status = 'failed',
-                error_message = ?,
-                completed_at = ?
-            WHERE id = ?
-        ''', (error_message, datetime.now().isoformat(), review_id))
+            cursor.execute(f'''
+                UPDATE reviews SET
+                    status = 'failed',
+                    error_message = ?,
+                    completed_at = {_NOW_SQL}
+                WHERE id = ?
+            ''', (error_message, review_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
+
+    def queue_review_failure(self, review_id: int, error_message: str, completed_at: str,
+                             on_commit: Optional[Callable] = None) -> Future:
+        """标记审查失败，由后台写线程与其他写操作合并提交，返回提交结果的Future"""
+        return _enqueue_write(self.db_path, [(_FAIL_REVIEW_SQL, (error_message, completed_at, review_id))],
+                              on_commit)
 
     def cancel_review_record(self, review_id: int, reason: str = "用户取消") -> bool:
         """取消审查记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
 
-            cursor.execute('''
-                UPDATE reviews SET
-                    status = 'cancelled',
-                    error_message = ?,
-                    completed_at = ?
-                WHERE id = ? AND status NOT IN ('completed', 'failed', 'cancelled')
-            ''', (reason, datetime.now().isoformat(), review_id))
+                cursor.execute(f'''
+                    UPDATE reviews SET
+                        status = 'cancelled',
+                        error_message = ?,
+                        completed_at = {_NOW_SQL}
+                    WHERE id = ? AND status NOT IN ('completed', 'failed', 'cancelled')
+                ''', (reason, review_id))
 
-            rows_affected = cursor.rowcount
-            conn.commit()
-            conn.close()
+                rows_affected = cursor.rowcount
+                conn.commit()
 
             return rows_affected > 0
         except Exception as e:
@@ -186,310 +497,300 @@ class ReviewDatabase:
 
     def add_issue_record(self, review_id: int, issue_data: Dict) -> int:
         """添加问题记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO issues (
-                review_id, file_path, line_number, severity, category,
-                message, suggestion, comment_text, confidence, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            review_id,
-            issue_data['file_path'],
-            issue_data['line_number'],
-            issue_data['severity'],
-            issue_data['category'],
-            issue_data['message'],
-            issue_data.get('suggestion'),
-            issue_data['comment_text'],
-            issue_data.get('confidence', 0.8),  # 默认值 0.8
-            datetime.now().isoformat()
-        ))
-
-        issue_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            cursor.execute(_INSERT_ISSUE_SQL, _issue_row(review_id, issue_data))
+
+            issue_id = cursor.lastrowid
+            conn.commit()
         return issue_id
 
+    def add_issues_bulk(self, review_id: int, issues: List[Dict]) -> List[int]:
+        """在单个事务中批量添加问题记录，返回新记录的ID（按插入顺序）"""
+        if not issues:
+            return []
+
+        rows = [_issue_row(review_id, issue_data) for issue_data in issues]
+        issue_ids = []
+
+        with self.db_manager.get_connection() as conn:
+            # 开始时即获取写锁，避免事务中途升级锁失败后反复重试
+            conn.execute('BEGIN IMMEDIATE')
+            if _RETURNING_SUPPORTED:
+                for start in range(0, len(rows), _ISSUES_PER_INSERT):
+                    chunk = rows[start:start + _ISSUES_PER_INSERT]
+                    sql = f"{_INSERT_ISSUE_PREFIX}{', '.join([_ISSUE_VALUES] * len(chunk))} RETURNING id"
+                    params = [value for row in chunk for value in row]
+                    # RETURNING的行顺序未定义，自增ID按插入顺序递增，排序后即为插入顺序
+                    issue_ids.extend(sorted(row[0] for row in conn.execute(sql, params)))
+            else:
+                for row in rows:
+                    issue_ids.append(conn.execute(_INSERT_ISSUE_SQL, row).lastrowid)
+            conn.commit()
+        return issue_ids
+
     def get_pending_comments(self, review_id: int) -> List[Dict]:
         """获取待确认的评论"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT * FROM issues
-            WHERE review_id = ? AND comment_status = 'pending'
-            ORDER BY file_path, line_number
-        ''', (review_id,))
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
 
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+            cursor.execute('''
+                SELECT * FROM issues
+                WHERE review_id = ? AND comment_status = 'pending'
+                ORDER BY file_path, line_number
+            ''', (review_id,))
+
+            rows = _fetch_dicts(cursor)
+        return rows
+
+    def count_pending_comments(self, review_id: int) -> int:
+        """统计待确认评论数量，不加载评论内容"""
+        with self.read_db_manager.get_connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM issues WHERE review_id = ? AND comment_status = 'pending'",
+                (review_id,)
+            ).fetchone()[0]
 
     def confirm_comment(self, issue_id: int) -> bool:
         """确认单个评论"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE issues SET
-                comment_status = 'confirmed',
-                confirmed_at = ?
-            WHERE id = ? AND comment_status = 'pending'
-        ''', (datetime.now().isoformat(), issue_id))
-
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return success
+        return self._set_comment_status(issue_id, 'confirmed')
 
     def reject_comment(self, issue_id: int) -> bool:
         """拒绝单个评论"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE issues SET
-                comment_status = 'rejected',
-                confirmed_at = ?
-            WHERE id = ? AND comment_status = 'pending'
-        ''', (datetime.now().isoformat(), issue_id))
+        return self._set_comment_status(issue_id, 'rejected')
 
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+    def _set_comment_status(self, issue_id: int, new_status: str) -> bool:
+        """按允许的状态转换更新单个评论的确认状态"""
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.execute(_SET_COMMENT_STATUS_SQL[new_status], (issue_id,))
+            success = cursor.rowcount > 0
+            conn.commit()
         return success
 
-    def bulk_confirm_comments(self, issue_ids: List[int]) -> int:
-        """批量确认评论"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def bulk_confirm_comments(self, review_id: int, issue_ids: List[int]) -> List[int]:
+        """批量确认同一审查下的评论，返回本次实际变为confirmed的评论ID"""
+        if not issue_ids:
+            return []
+
+        confirm_prefix = f"{_SET_COMMENT_STATUS_PREFIX['confirmed']} AND review_id = ?"
+        confirmed_ids = []
+        with self.db_manager.get_connection() as conn:
+            # 开始时即获取写锁，读取与更新之间不会有其他请求修改评论状态
+            conn.execute('BEGIN IMMEDIATE')
+            # 每块一条UPDATE ... IN，所有块在同一事务中提交
+            for start in range(0, len(issue_ids), MAX_SQL_VARIABLES - 1):
+                chunk = issue_ids[start:start + MAX_SQL_VARIABLES - 1]
+                placeholders = ','.join('?' * len(chunk))
+                if _RETURNING_SUPPORTED:
+                    cursor = conn.execute(f"{confirm_prefix} AND id IN ({placeholders}) RETURNING id",
+                                          (review_id, *chunk))
+                    confirmed_ids.extend(row[0] for row in cursor)
+                else:
+                    chunk_ids = [row[0] for row in conn.execute(
+                        f"SELECT id FROM issues WHERE {_COMMENT_STATUS_CONDITION['confirmed']} "
+                        f"AND review_id = ? AND id IN ({placeholders})",
+                        (review_id, *chunk)
+                    )]
+                    if chunk_ids:
+                        conn.execute(f"{confirm_prefix} AND id IN ({','.join('?' * len(chunk_ids))})",
+                                     (review_id, *chunk_ids))
+                    confirmed_ids.extend(chunk_ids)
 
-        confirmed_count = 0
-        confirmed_at = datetime.now().isoformat()
-
-        for issue_id in issue_ids:
-            cursor.execute('''
-                UPDATE issues SET
-                    comment_status = 'confirmed',
-                    confirmed_at = ?
-                WHERE id = ? AND comment_status = 'pending'
-            ''', (confirmed_at, issue_id))
-            confirmed_count += cursor.rowcount
-
-        conn.commit()
-        conn.close()
-        return confirmed_count
+            conn.commit()
+        return confirmed_ids
+
+    def get_issues_by_ids(self, issue_ids: List[int]) -> List[Dict]:
+        """批量获取问题记录"""
+        if not issue_ids:
+            return []
+
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
+
+            issue_ids = list(issue_ids)
+            rows = []
+            for start in range(0, len(issue_ids), MAX_SQL_VARIABLES):
+                chunk = issue_ids[start:start + MAX_SQL_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT * FROM issues WHERE id IN ({placeholders})', chunk)
+                rows.extend(_fetch_dicts(cursor))
+        return rows
+
+    def record_comment_post_result(self, review_id: int, issue_id: int, gitlab_comment_id: Optional[str],
+                                   on_commit: Optional[Callable] = None) -> Future:
+        """记录评论发布结果（gitlab_comment_id为None表示失败），由后台写线程批量提交，返回提交结果的Future"""
+        if gitlab_comment_id is None:
+            statements = [(_MARK_COMMENT_POST_FAILED_SQL, (issue_id,))]
+        else:
+            statements = [
+                (_MARK_COMMENT_POSTED_SQL, (gitlab_comment_id, issue_id)),
+                (_INCREMENT_COMMENTS_POSTED_SQL, (1, review_id))
+            ]
+        return _enqueue_write(self.db_path, statements, on_commit)
 
-    def update_comment_gitlab_id(self, issue_id: int, gitlab_comment_id: str):
-        """更新GitLab评论ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_comment_statuses(self, review_id: int) -> List[Dict]:
+        """获取审查中已处理评论的发布状态"""
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
 
-        cursor.execute('''
-            UPDATE issues SET
-                gitlab_comment_id = ?,
-                comment_status = 'posted'
-            WHERE id = ?
-        ''', (gitlab_comment_id, issue_id))
+            cursor.execute('''
+                SELECT id, comment_status, gitlab_comment_id FROM issues
+                WHERE review_id = ? AND comment_status != 'pending'
+            ''', (review_id,))
 
-        conn.commit()
-        conn.close()
+            rows = _fetch_dicts(cursor)
+        return rows
 
     def get_review_record(self, review_id: int) -> Optional[Dict]:
         """获取审查记录"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT * FROM reviews WHERE id = ?', (review_id,))
-        row = cursor.fetchone()
-        conn.close()
+            cursor.execute(_SELECT_REVIEW_SQL, (review_id,))
+            row = cursor.fetchone()
 
         return dict(row) if row else None
 
     def get_review_by_mr_url(self, mr_url: str) -> Optional[Dict]:
         """根据MR URL获取审查记录"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT * FROM reviews WHERE mr_url = ? ORDER BY created_at DESC LIMIT 1', (mr_url,))
-        row = cursor.fetchone()
-        conn.close()
+            cursor.execute('SELECT * FROM reviews WHERE mr_url = ? ORDER BY created_at DESC LIMIT 1', (mr_url,))
+            row = cursor.fetchone()
 
         return dict(row) if row else None
 
-    def get_review_issues(self, review_id: int) -> List[Dict]:
-        """获取审查的问题列表"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def get_review_issues(self, review_id: int, limit: Optional[int] = None, after_file: str = '',
+                          after_line: int = 0, after_id: int = 0) -> List[Dict]:
+        """获取审查的问题列表，指定limit时返回排在(after_file, after_line, after_id)之后的一页"""
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
 
-        cursor.execute('''
-            SELECT * FROM issues
-            WHERE review_id = ?
-            ORDER BY file_path, line_number
-        ''', (review_id,))
+            if limit is None:
+                cursor.execute(_SELECT_REVIEW_ISSUES_SQL, (review_id,))
+            else:
+                cursor.execute(_SELECT_REVIEW_ISSUES_PAGE_SQL, (review_id, after_file, after_line, after_id, limit))
 
-        rows = cursor.fetchall()
-        conn.close()
+            rows = _fetch_dicts(cursor)
 
-        return [dict(row) for row in rows]
+        return rows
 
     def get_review_comments(self, review_id: int) -> List[Dict]:
         """获取审查的评论列表"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
 
-        cursor.execute('''
-            SELECT * FROM issues
-            WHERE review_id = ? AND comment_status != 'pending'
-            ORDER BY file_path, line_number
-        ''', (review_id,))
+            cursor.execute('''
+                SELECT * FROM issues
+                WHERE review_id = ? AND comment_status != 'pending'
+                ORDER BY file_path, line_number
+            ''', (review_id,))
 
-        rows = cursor.fetchall()
-        conn.close()
+            rows = _fetch_dicts(cursor)
 
-        return [dict(row) for row in rows]
+        return rows
 
     def get_user_reviews(self, user_id: str = None, limit: int = 10, offset: int = 0) -> List[Dict]:
         """获取用户的审查记录，如果user_id为None则获取所有记录（管理员功能）"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
+
+            if user_id is None:
+                # 管理员查看所有审查记录
+                cursor.execute('''
+                    SELECT * FROM reviews
+                    ORDER BY created_at DESC
+                    LIMIT ? OFFSET ?
+                ''', (limit, offset))
+            else:
+                # 普通用户查看自己的审查记录
+                cursor.execute('''
+                    SELECT * FROM reviews
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC
+                    LIMIT ? OFFSET ?
+                ''', (user_id, limit, offset))
 
-        if user_id is None:
-            # 管理员查看所有审查记录
-            cursor.execute('''
-                SELECT * FROM reviews
-                ORDER BY created_at DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
-        else:
-            # 普通用户查看自己的审查记录
-            cursor.execute('''
-                SELECT * FROM reviews
-                WHERE user_id = ?
-                ORDER BY created_at DESC
-                LIMIT ? OFFSET ?
-            ''', (user_id, limit, offset))
+            rows = _fetch_dicts(cursor)
 
-        rows = cursor.fetchall()
-        conn.close()
-
-        return [dict(row) for row in rows]
+        return rows
 
     def get_reviews_count(self, user_id: str = None) -> int:
         """获取审查记录总数"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         if user_id is None:
-            # 管理员查看所有记录总数
-            cursor.execute('SELECT COUNT(*) FROM reviews')
-        else:
-            # 普通用户查看自己的记录总数
-            cursor.execute('SELECT COUNT(*) FROM reviews WHERE user_id = ?', (user_id,))
-
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+            # 管理员查看所有记录总数，优先使用缓存
+            count = _reviews_count_cache.get(self.db_path)
+            if count is None:
+                with self.read_db_manager.get_connection() as conn:
+                    count = conn.execute('SELECT COUNT(*) FROM reviews').fetchone()[0]
+                _reviews_count_cache.set(self.db_path, count)
+            return count
+
+        # 普通用户查看自己的记录总数，只扫描idx_reviews_user_created中该用户的条目
+        with self.read_db_manager.get_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM reviews WHERE user_id = ?', (user_id,)).fetchone()[0]
 
     def get_review_statistics(self, user_id: str = None, days: int = None, start_date: str = None, end_date: str = None) -> Dict:
         """获取审查统计信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        # 时间范围
-        from datetime import datetime, timedelta
-        if start_date and end_date:
-            # 使用自定义日期范围
-            since_date = start_date
-            until_date = end_date + 'T23:59:59'  # 包含结束日期的整天
-            where_clause = 'created_at >= ? AND created_at <= ?'
-            date_params = (since_date, until_date)
-        else:
-            # 使用天数计算
-            if days is not None:
-                since_date = (datetime.now() - timedelta(days=days)).isoformat()
-                where_clause = 'created_at > ?'
-                date_params = (since_date,)
+            # 时间范围
+            if start_date and end_date:
+                # 使用自定义日期范围
+                since_date = start_date
+                until_date = end_date + 'T23:59:59'  # 包含结束日期的整天
+                where_clause = 'created_at >= ? AND created_at <= ?'
+                date_params = (since_date, until_date)
             else:
-                # 默认30天
-                since_date = (datetime.now() - timedelta(days=30)).isoformat()
-                where_clause = 'created_at > ?'
-                date_params = (since_date,)
-
-        if user_id is None:
-            # 全局统计
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE {where_clause}', date_params)
-            total_reviews = cursor.fetchone()[0]
-
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE status = "completed" AND {where_clause}', date_params)
-            completed_reviews = cursor.fetchone()[0]
-
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE status = "failed" AND {where_clause}', date_params)
-            failed_reviews = cursor.fetchone()[0]
-
-            cursor.execute(f'SELECT SUM(total_issues_found) FROM reviews WHERE {where_clause}', date_params)
-            total_issues = cursor.fetchone()[0] or 0
-
-            cursor.execute(f'SELECT COUNT(DISTINCT user_id) FROM reviews WHERE {where_clause}', date_params)
-            active_users = cursor.fetchone()[0]
-        else:
-            # 用户统计
-            user_params = (user_id,) + date_params
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE user_id = ? AND {where_clause}', user_params)
-            total_reviews = cursor.fetchone()[0]
-
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE user_id = ? AND status = "completed" AND {where_clause}', user_params)
-            completed_reviews = cursor.fetchone()[0]
-
-            cursor.execute(f'SELECT COUNT(*) FROM reviews WHERE user_id = ? AND status = "failed" AND {where_clause}', user_params)
-            failed_reviews = cursor.fetchone()[0]
+                # 使用天数计算
+                if days is not None:
+                    since_date = (datetime.now() - timedelta(days=days)).isoformat()
+                    where_clause = 'created_at > ?'
+                    date_params = (since_date,)
+                else:
+                    # 默认30天
+                    since_date = (datetime.now() - timedelta(days=30)).isoformat()
+                    where_clause = 'created_at > ?'
+                    date_params = (since_date,)
+
+            # 审查数、成功/失败数、问题数和活跃用户数在一次扫描中用条件聚合得到
+            if user_id is not None:
+                where_clause = f'user_id = ? AND {where_clause}'
+                date_params = (user_id,) + date_params
 
-            cursor.execute(f'SELECT SUM(total_issues_found) FROM reviews WHERE user_id = ? AND {where_clause}', user_params)
-            total_issues = cursor.fetchone()[0] or 0
-
-            active_users = 1 if total_reviews > 0 else 0
-
-        # 添加评论统计（修复后的逻辑）
-        if user_id is None:
-            # 全局评论统计
-            comment_where_clause = where_clause.replace('created_at', 'r.created_at')
             cursor.execute(f'''
                 SELECT
-                    COUNT(CASE WHEN i.comment_status IN ('confirmed', 'posted') THEN 1 END) as total_comments,
-                    COUNT(DISTINCT CASE WHEN i.comment_status IN ('confirmed', 'posted') THEN i.review_id END) as reviews_with_comments
-                FROM issues i
-                JOIN reviews r ON i.review_id = r.id
-                WHERE {comment_where_clause}
+                    COUNT(*),
+                    COUNT(CASE WHEN status = 'completed' THEN 1 END),
+                    COUNT(CASE WHEN status = 'failed' THEN 1 END),
+                    COALESCE(SUM(total_issues_found), 0),
+                    COUNT(DISTINCT user_id)
+                FROM reviews
+                WHERE {where_clause}
             ''', date_params)
-        else:
-            # 用户评论统计
-            comment_where_clause = where_clause.replace('created_at', 'r.created_at')
+            total_reviews, completed_reviews, failed_reviews, total_issues, active_users = cursor.fetchone()
+
+            # 评论统计
+            comment_where_clause = where_clause.replace('created_at', 'r.created_at').replace('user_id', 'r.user_id')
             cursor.execute(f'''
                 SELECT
                     COUNT(CASE WHEN i.comment_status IN ('confirmed', 'posted') THEN 1 END) as total_comments,
                     COUNT(DISTINCT CASE WHEN i.comment_status IN ('confirmed', 'posted') THEN i.review_id END) as reviews_with_comments
                 FROM issues i
                 JOIN reviews r ON i.review_id = r.id
-                WHERE r.user_id = ? AND {comment_where_clause}
-            ''', user_params)
-
-        comment_stats = cursor.fetchone()
-        total_comments = comment_stats[0] or 0
-        reviews_with_comments = comment_stats[1] or 0
+                WHERE {comment_where_clause}
+            ''', date_params)
 
-        # 计算评论相关指标
-        comment_rate = (reviews_with_comments / total_reviews * 100) if total_reviews > 0 else 0
-        avg_comments_per_review = (total_comments / total_reviews) if total_reviews > 0 else 0
+            comment_stats = cursor.fetchone()
+            total_comments = comment_stats[0] or 0
+            reviews_with_comments = comment_stats[1] or 0
 
-        conn.close()
+            # 计算评论相关指标
+            comment_rate = (reviews_with_comments / total_reviews * 100) if total_reviews > 0 else 0
+            avg_comments_per_review = (total_comments / total_reviews) if total_reviews > 0 else 0
 
         return {
             'total_reviews': total_reviews,
@@ -507,132 +808,144 @@ class ReviewDatabase:
 
     def get_daily_review_trend(self, days: int = 30, user_id: str = None, start_date: str = None, end_date: str = None) -> List[Dict]:
         """获取每日审查趋势数据"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        from datetime import datetime, timedelta
-
-        # 生成日期范围
-        if start_date and end_date:
-            start_dt = datetime.fromisoformat(start_date)
-            end_dt = datetime.fromisoformat(end_date)
-        else:
-            end_dt = datetime.now()
-            # 如果days为None，默认使用30天
-            days = days if days is not None else 30
-            start_dt = end_dt - timedelta(days=days)
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
 
-        start_date_str = start_dt.isoformat()
-        end_date_str = end_dt.isoformat()
-
-        if user_id is None:
-            # 全局趋势
-            cursor.execute('''
-                SELECT DATE(created_at) as date,
-                       COUNT(*) as total_count,
-                       SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_count,
-                       SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count
-                FROM reviews
-                WHERE created_at >= ? AND created_at <= ?
-                GROUP BY DATE(created_at)
-                ORDER BY date
-            ''', (start_date_str, end_date_str))
-        else:
-            # 用户趋势
-            cursor.execute('''
-                SELECT DATE(created_at) as date,
-                       COUNT(*) as total_count,
-                       SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_count,
-                       SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count
-                FROM reviews
-                WHERE user_id = ? AND created_at >= ? AND created_at <= ?
-                GROUP BY DATE(created_at)
-                ORDER BY date
-            ''', (user_id, start_date_str, end_date_str))
-
-        rows = cursor.fetchall()
-        conn.close()
-
-        # 创建完整的日期范围数据，填补缺失的日期
-        result = []
-        current_date = start_dt.date()
-        end_date_obj = end_dt.date()
-
-        # 将数据库结果转换为字典，方便查找
-        data_dict = {}
-        for row in rows:
-            date_str = row[0]
-            data_dict[date_str] = {
-                'date': date_str,
-                'total_count': row[1],
-                'completed_count': row[2],
-                'failed_count': row[3]
-            }
-
-        # 填充完整的日期范围
-        while current_date <= end_date_obj:
-            date_str = current_date.isoformat()
-            if date_str in data_dict:
-                result.append(data_dict[date_str])
+            # 生成日期范围
+            if start_date and end_date:
+                start_dt = datetime.fromisoformat(start_date)
+                end_dt = datetime.fromisoformat(end_date)
             else:
-                result.append({
-                    'date': date_str,
-                    'total_count': 0,
-                    'completed_count': 0,
-                    'failed_count': 0
-                })
-            current_date += timedelta(days=1)
+                end_dt = datetime.now()
+                # 如果days为None，默认使用30天
+                days = days if days is not None else 30
+                start_dt = end_dt - timedelta(days=days)
+
+            params = {
+                'start': start_dt.isoformat(),
+                'end': end_dt.isoformat(),
+                'start_day': start_dt.date().isoformat(),
+                'end_day': end_dt.date().isoformat(),
+                'user_id': user_id
+            }
+            user_filter = 'user_id = :user_id AND ' if user_id is not None else ''
 
-        return result
+            # 递归CTE生成完整日期序列并左连接每日聚合结果，缺失的日期直接在SQL中补零
+            cursor.execute(f'''
+                WITH RECURSIVE dates(date) AS (
+                    SELECT :start_day WHERE :start_day <= :end_day
+                    UNION ALL
+                    SELECT date(date, '+1 day') FROM dates WHERE date < :end_day
+                ),
+                daily AS (
+                    SELECT DATE(created_at) AS date,
+                           COUNT(*) AS total_count,
+                           COUNT(CASE WHEN status = 'completed' THEN 1 END) AS completed_count,
+                           COUNT(CASE WHEN status = 'failed' THEN 1 END) AS failed_count
+                    FROM reviews
+                    WHERE {user_filter}created_at >= :start AND created_at <= :end
+                    GROUP BY DATE(created_at)
+                )
+                SELECT dates.date AS date,
+                       COALESCE(daily.total_count, 0) AS total_count,
+                       COALESCE(daily.completed_count, 0) AS completed_count,
+                       COALESCE(daily.failed_count, 0) AS failed_count
+                FROM dates
+                LEFT JOIN daily ON daily.date = dates.date
+                ORDER BY dates.date
+            ''', params)
+
+            rows = _fetch_dicts(cursor)
+        return rows
 
     def search_reviews(self, query: str, user_id: str = None, limit: int = 20) -> List[Dict]:
-        return []  # Simplified
+        """按MR标题、作者、项目路径和分支搜索审查记录"""
+        terms = query.split()
+        if not terms:
+            return []
+
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
+
+            if self.fts_enabled:
+                # 每个词按前缀短语匹配，避免用户输入被解析为FTS5查询语法
+                match = ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+                sql = '''
+                    SELECT r.* FROM reviews_fts f
+                    JOIN reviews r ON r.id = f.rowid
+                    WHERE reviews_fts MATCH ?
+                '''
+                params = [match]
+                if user_id:
+                    sql += ' AND r.user_id = ?'
+                    params.append(user_id)
+                sql += ' ORDER BY f.rank LIMIT ?'
+            else:
+                pattern = f'%{query}%'
+                sql = '''
+                    SELECT * FROM reviews
+                    WHERE (mr_title LIKE ? OR mr_author LIKE ? OR project_path LIKE ? OR source_branch LIKE ?)
+                '''
+                params = [pattern] * 4
+                if user_id:
+                    sql += ' AND user_id = ?'
+                    params.append(user_id)
+                sql += ' ORDER BY created_at DESC LIMIT ?'
+            params.append(limit)
+
+            cursor.execute(sql, params)
+            rows = _fetch_dicts(cursor)
+
+        return rows
 
     def delete_review_record(self, review_id: int):
         pass  # Simplified
 
-    def export_review_data(self, review_id: int) -> Dict:
-        return {}  # Simplified
+    def iter_review_issues(self, review_id: int) -> Iterator[Dict]:
+        """逐行迭代审查的问题列表，避免一次性加载到内存"""
+        with self.read_db_manager.get_connection() as conn:
+            cursor = _tuple_cursor(conn)
+            cursor.execute(_SELECT_REVIEW_ISSUES_SQL, (review_id,))
+            columns = [column[0] for column in cursor.description]
+            for row in cursor:
+                yield dict(zip(columns, row))
 
     # ============ 进度管理方法 ============
 
     def init_review_progress(self, review_id: int, total_files: int):
         """初始化审查进度"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO review_progress
-            (review_id, status, total_files, processed_files, total_issues, current_file, last_update)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (review_id, 'analyzing', total_files, 0, 0, None, datetime.now().isoformat()))
+            # 重新开始的审查原地覆盖已有进度行，避免REPLACE的删除再插入
+            cursor.execute(f'''
+                INSERT INTO review_progress
+                (review_id, status, total_files, processed_files, total_issues, current_file, last_update)
+                VALUES (?, ?, ?, ?, ?, ?, {_NOW_SQL})
+                ON CONFLICT (review_id) DO UPDATE SET
+                    status = excluded.status, total_files = excluded.total_files,
+                    processed_files = excluded.processed_files, total_issues = excluded.total_issues,
+                    current_file = excluded.current_file, last_update = excluded.last_update
+            ''', (review_id, 'analyzing', total_files, 0, 0, None))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def update_review_progress(self, review_id: int, status: str, processed_files: int, total_issues: int, current_file: str = None):
         """更新审查进度"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE review_progress
-            SET status = ?, processed_files = ?, total_issues = ?, current_file = ?, last_update = ?
-            WHERE review_id = ?
-        ''', (status, processed_files, total_issues, current_file, datetime.now().isoformat(), review_id))
+            cursor.execute(_UPDATE_PROGRESS_SQL, (status, processed_files, total_issues, current_file, review_id))
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_review_progress(self, review_id: int) -> Optional[Dict]:
         """获取审查进度"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with self.read_db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT * FROM review_progress WHERE review_id = ?', (review_id,))
-        row = cursor.fetchone()
-        conn.close()
+            cursor.execute(_SELECT_PROGRESS_SQL, (review_id,))
+            row = cursor.fetchone()
 
         if row:
             return dict(row)
@@ -640,24 +953,9 @@ class ReviewDatabase:
 
     def delete_review_progress(self, review_id: int):
         """删除审查进度记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DELETE FROM review_progress WHERE review_id = ?', (review_id,))
-
-        conn.commit()
-        conn.close()
-
-    def update_comments_posted_count(self, review_id: int, posted_count: int):
-        """更新已发布评论数量"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE reviews
-            SET comments_posted = comments_posted + ?
-            WHERE id = ?
-        ''', (posted_count, review_id))
+            cursor.execute('DELETE FROM review_progress WHERE review_id = ?', (review_id,))
 
-        conn.commit()
-        conn.close()
\ No newline at end of file
+            conn.commit()
@@ -9,16 +9,22 @@
 - 审计日志记录
 """
 
+import sys
 import time
-import uuid
+import heapq
+import secrets
 import threading
 import logging
-from typing import Dict, List, Optional, Callable
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Callable, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
 
 from .policies import SecurityContext, AuthorizationLevel, OperationType
 
+# dataclass的slots参数需要Python 3.10；带默认值的字段无法与手工__slots__共存，更早的版本退回普通dataclass
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 
 class AuthorizationStatus(Enum):
     """授权状态枚举"""
@@ -29,7 +35,7 @@ class AuthorizationStatus(Enum):
     CANCELLED = "cancelled"  # 已取消
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class AuthorizationRequest:
     """授权请求"""
     request_id: str
@@ -46,7 +52,7 @@ class AuthorizationRequest:
     denial_reason: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class AuthorizationResponse:
     """授权响应"""
     request_id: str
@@ -55,6 +61,16 @@ class AuthorizationResponse:
     metadata: Dict = field(default_factory=dict)
 
 
+# 操作描述表：固定文案直接使用字符串，需要上下文的使用函数生成
+_OPERATION_DESCRIPTIONS: Dict[OperationType, Union[str, Callable[[SecurityContext], str]]] = {
+    OperationType.POST_COMMENT: "发布代码评审评论到GitLab",
+    OperationType.ACCESS_EXTERNAL_API: lambda context: f"访问外部API: {context.target_system}",
+    OperationType.READ_FILE: lambda context: f"读取文件: {context.resource_path}",
+    OperationType.ANALYZE_CODE: "使用AI分析代码",
+    OperationType.GENERATE_COMMENT: "生成评审评论"
+}
+
+
 class UserAuthorizer:
     """
     用户授权管理器 - 管理需要用户确认的操作
@@ -79,10 +95,24 @@ class UserAuthorizer:
 
         # 存储授权请求
         self.pending_requests: Dict[str, AuthorizationRequest] = {}
-        self.completed_requests: Dict[str, AuthorizationRequest] = {}
+        # 按完成顺序保存，超出上限时直接淘汰最早完成的请求
+        self.completed_requests: "OrderedDict[str, AuthorizationRequest]" = OrderedDict()
+        # completed_requests中各最终状态的数量，随移入和淘汰增减，统计时无需遍历
+        self._completed_status_counts: Counter = Counter()
+
+        # 按用户索引的待处理请求：user_id -> {request_id: 请求}，按插入顺序即创建顺序
+        self._pending_by_user: Dict[str, Dict[str, AuthorizationRequest]] = {}
+
+        # 过期时间小顶堆：(expires_at, request_id)，已完成请求的条目在到期弹出时跳过
+        self._expiry_heap: List[Tuple[float, str]] = []
 
         # 线程安全锁
         self.requests_lock = threading.RLock()
+        # 清理线程等待到最近的过期时间，新请求成为最早过期者时唤醒它
+        self._cleanup_cv = threading.Condition(self.requests_lock)
+
+        # 每个待处理请求的完成事件，请求离开待处理状态时置位，唤醒等待者
+        self._events: Dict[str, threading.Event] = {}
 
         # 事件回调
         self.authorization_callbacks: Dict[str, Callable] = {}
@@ -106,18 +136,11 @@ class UserAuthorizer:
         Returns:
             AuthorizationRequest: 授权请求对象
         """
-        # 生成请求ID
-        request_id = f"auth_{uuid.uuid4().hex[:8]}"
+        # 生成请求ID：批准/拒绝接口仅凭ID定位请求，ID必须不可预测，不能改用自增计数；
+        # 128位随机数无法枚举，大量待处理和已完成请求并存时也不会冲突
+        request_id = f"auth_{secrets.token_hex(16)}"
 
-        # 创建授权请求
-        auth_request = AuthorizationRequest(
-            request_id=request_id,
-            user_id=security_context.user_id,
-            operation_type=security_context.operation_type,
-            description=description or self._generate_description(security_context),
-            security_context=security_context,
-            required_level=required_level
-        )
+        description = description or self._generate_description(security_context)
 
         with self.requests_lock:
             # 检查待处理请求数量
@@ -127,10 +150,28 @@ class UserAuthorizer:
             if len(self.pending_requests) >= self.max_pending_requests:
                 raise RuntimeError("Too many pending authorization requests")
 
+            # 创建授权请求：在锁内取时间，待处理字典的插入顺序即为created_at顺序
+            now = time.time()
+            auth_request = AuthorizationRequest(
+                request_id=request_id,
+                user_id=security_context.user_id,
+                operation_type=security_context.operation_type,
+                description=description,
+                security_context=security_context,
+                required_level=required_level,
+                created_at=now,
+                expires_at=now + self.request_timeout
+            )
+
             # 存储请求
             self.pending_requests[request_id] = auth_request
+            self._pending_by_user.setdefault(auth_request.user_id, {})[request_id] = auth_request
+            self._events[request_id] = threading.Event()
+            heapq.heappush(self._expiry_heap, (auth_request.expires_at, request_id))
+            if self._expiry_heap[0][1] == request_id:
+                self._cleanup_cv.notify()
 
-        self.logger.info(f"Created authorization request {request_id} for user {auth_request.user_id}")
+        self.logger.info("Created authorization request %s for user %s", request_id, auth_request.user_id)
         return auth_request
 
     def approve_request(self, request_id: str, approved_by: str) -> AuthorizationResponse:
@@ -154,8 +195,9 @@ class UserAuthorizer:
                     message="Authorization request not found"
                 )
 
-            # 检查是否过期
-            if time.time() > auth_request.expires_at:
+            # 检查是否过期，过期判断和批准时间使用同一时刻
+            now = time.time()
+            if now > auth_request.expires_at:
                 auth_request.status = AuthorizationStatus.EXPIRED
                 self._move_to_completed(request_id, auth_request)
                 return AuthorizationResponse(
@@ -166,22 +208,23 @@ class UserAuthorizer:
 
             # 批准请求
             auth_request.status = AuthorizationStatus.APPROVED
-            auth_request.approved_at = time.time()
+            auth_request.approved_at = now
             auth_request.approved_by = approved_by
 
             # 移动到已完成列表
             self._move_to_completed(request_id, auth_request)
+            callback = self.authorization_callbacks.pop(request_id, None)
 
-            # 触发回调
-            self._trigger_callback(request_id, auth_request)
+        # 在锁外触发回调，回调中的代码不阻塞其他授权操作
+        self._trigger_callback(request_id, auth_request, callback)
 
-            self.logger.info(f"Approved authorization request {request_id} by {approved_by}")
+        self.logger.info("Approved authorization request %s by %s", request_id, approved_by)
 
-            return AuthorizationResponse(
-                request_id=request_id,
-                status=AuthorizationStatus.APPROVED,
-                message="Authorization approved"
-            )
+        return AuthorizationResponse(
+            request_id=request_id,
+            status=AuthorizationStatus.APPROVED,
+            message="Authorization approved"
+        )
 
     def deny_request(self, request_id: str, denied_by: str, reason: str = "") -> AuthorizationResponse:
         """
@@ -212,17 +255,18 @@ class UserAuthorizer:
 
             # 移动到已完成列表
             self._move_to_completed(request_id, auth_request)
+            callback = self.authorization_callbacks.pop(request_id, None)
 
-            # 触发回调
-            self._trigger_callback(request_id, auth_request)
+        # 在锁外触发回调
+        self._trigger_callback(request_id, auth_request, callback)
 
-            self.logger.info(f"Denied authorization request {request_id} by {denied_by}: {reason}")
+        self.logger.info("Denied authorization request %s by %s: %s", request_id, denied_by, reason)
 
-            return AuthorizationResponse(
-                request_id=request_id,
-                status=AuthorizationStatus.DENIED,
-                message=f"Authorization denied: {reason}"
-            )
+        return AuthorizationResponse(
+            request_id=request_id,
+            status=AuthorizationStatus.DENIED,
+            message=f"Authorization denied: {reason}"
+        )
 
     def get_pending_requests(self, user_id: Optional[str] = None) -> List[AuthorizationRequest]:
         """
@@ -235,15 +279,12 @@ class UserAuthorizer:
             List[AuthorizationRequest]: 待处理请求列表
         """
         with self.requests_lock:
-            requests = list(self.pending_requests.values())
-
             if user_id:
-                requests = [req for req in requests if req.user_id == user_id]
+                # 单个用户的请求直接取索引，插入顺序即创建顺序
+                return list(self._pending_by_user.get(user_id, {}).values())
 
-            # 按创建时间排序
-            requests.sort(key=lambda x: x.created_at)
-
-            return requests
+            # 字典按插入顺序即创建顺序保存，无需排序
+            return list(self.pending_requests.values())
 
     def get_request_status(self, request_id: str) -> Optional[AuthorizationRequest]:
         """
@@ -280,22 +321,19 @@ class UserAuthorizer:
         if timeout is None:
             timeout = self.request_timeout
 
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            auth_request = self.get_request_status(request_id)
-
-            if not auth_request:
-                return AuthorizationStatus.CANCELLED
+        with self.requests_lock:
+            event = self._events.get(request_id)
 
-            if auth_request.status != AuthorizationStatus.PENDING:
-                return auth_request.status
+        # 阻塞等待请求完成事件，批准/拒绝/取消/过期时立即唤醒，无需轮询
+        if event is not None and not event.wait(timeout):
+            # 超时处理
+            self._expire_request(request_id)
 
-            time.sleep(1)  # 等待1秒后重新检查
+        auth_request = self.get_request_status(request_id)
+        if not auth_request:
+            return AuthorizationStatus.CANCELLED
 
-        # 超时处理
-        self._expire_request(request_id)
-        return AuthorizationStatus.EXPIRED
+        return auth_request.status
 
     def cancel_request(self, request_id: str) -> bool:
         """
@@ -316,7 +354,7 @@ class UserAuthorizer:
             auth_request.status = AuthorizationStatus.CANCELLED
             self._move_to_completed(request_id, auth_request)
 
-            self.logger.info(f"Cancelled authorization request {request_id}")
+            self.logger.info("Cancelled authorization request %s", request_id)
             return True
 
     def register_callback(self, request_id: str, callback: Callable[[AuthorizationRequest], None]):
@@ -327,48 +365,49 @@ class UserAuthorizer:
             request_id: 请求ID
             callback: 回调函数
         """
-        self.authorization_callbacks[request_id] = callback
+        with self.requests_lock:
+            self.authorization_callbacks[request_id] = callback
 
     def _generate_description(self, security_context: SecurityContext) -> str:
         """生成操作描述"""
-        operation_descriptions = {
-            OperationType.POST_COMMENT: "发布代码评审评论到GitLab",
-            OperationType.ACCESS_EXTERNAL_API: f"访问外部API: {security_context.target_system}",
-            OperationType.READ_FILE: f"读取文件: {security_context.resource_path}",
-            OperationType.ANALYZE_CODE: "使用AI分析代码",
-            OperationType.GENERATE_COMMENT: "生成评审评论"
-        }
-
-        return operation_descriptions.get(
-            security_context.operation_type,
-            f"执行操作: {security_context.operation_type.value}"
-        )
+        description = _OPERATION_DESCRIPTIONS.get(security_context.operation_type)
+        if description is None:
+            return f"执行操作: {security_context.operation_type.value}"
+        if callable(description):
+            return description(security_context)
+        return description
 
     def _move_to_completed(self, request_id: str, auth_request: AuthorizationRequest):
         """将请求移动到已完成列表"""
         if request_id in self.pending_requests:
             del self.pending_requests[request_id]
 
+            user_requests = self._pending_by_user.get(auth_request.user_id)
+            if user_requests is not None:
+                user_requests.pop(request_id, None)
+                if not user_requests:
+                    del self._pending_by_user[auth_request.user_id]
+
         self.completed_requests[request_id] = auth_request
+        self._completed_status_counts[auth_request.status] += 1
 
-        # 限制已完成请求的数量
+        event = self._events.pop(request_id, None)
+        if event is not None:
+            event.set()
+
+        # 限制已完成请求的数量，删除最早完成的请求
         if len(self.completed_requests) > 1000:
-            # 删除最旧的请求
-            oldest_id = min(self.completed_requests.keys(),
-                          key=lambda x: self.completed_requests[x].created_at)
-            del self.completed_requests[oldest_id]
-
-    def _trigger_callback(self, request_id: str, auth_request: AuthorizationRequest):
-        """触发授权结果回调"""
-        callback = self.authorization_callbacks.get(request_id)
+            _, evicted = self.completed_requests.popitem(last=False)
+            self._completed_status_counts[evicted.status] -= 1
+
+    def _trigger_callback(self, request_id: str, auth_request: AuthorizationRequest,
+                          callback: Optional[Callable[[AuthorizationRequest], None]]):
+        """触发授权结果回调，回调已在锁内从注册表中取出，此处在锁外调用"""
         if callback:
             try:
                 callback(auth_request)
             except Exception as e:
-                self.logger.error(f"Error in authorization callback for {request_id}: {e}")
-            finally:
-                # 清理回调
-                del self.authorization_callbacks[request_id]
+                self.logger.error("Error in authorization callback for %s: %s", request_id, e)
 
     def _expire_request(self, request_id: str):
         """使请求过期"""
@@ -381,18 +420,19 @@ class UserAuthorizer:
     def _cleanup_expired_requests(self):
         """清理过期的请求"""
         current_time = time.time()
-        expired_ids = []
+        expired_count = 0
 
         with self.requests_lock:
-            for request_id, auth_request in self.pending_requests.items():
-                if current_time > auth_request.expires_at:
-                    expired_ids.append(request_id)
+            # 只弹出已到期的堆顶条目，不扫描全部待处理请求
+            heap = self._expiry_heap
+            while heap and heap[0][0] < current_time:
+                _, request_id = heapq.heappop(heap)
+                if request_id in self.pending_requests:
+                    self._expire_request(request_id)
+                    expired_count += 1
 
-            for request_id in expired_ids:
-                self._expire_request(request_id)
-
-        if expired_ids:
-            self.logger.info(f"Cleaned up {len(expired_ids)} expired authorization requests")
+        if expired_count:
+            self.logger.info("Cleaned up %s expired authorization requests", expired_count)
 
     def _start_cleanup_thread(self):
         """启动清理线程"""
@@ -400,9 +440,15 @@ class UserAuthorizer:
             while True:
                 try:
                     self._cleanup_expired_requests()
-                    time.sleep(60)  # 每分钟清理一次
                 except Exception as e:
-                    self.logger.error(f"Error in cleanup thread: {e}")
+                    self.logger.error("Error in cleanup thread: %s", e)
+
+                # 没有待过期请求时一直等待，否则等到堆顶请求过期
+                with self._cleanup_cv:
+                    timeout = None
+                    if self._expiry_heap:
+                        timeout = max(0.1, self._expiry_heap[0][0] - time.time())
+                    self._cleanup_cv.wait(timeout)
 
         cleanup_thread = threading.Thread(target=cleanup_worker, daemon=True)
         cleanup_thread.start()
@@ -416,12 +462,9 @@ class UserAuthorizer:
         """
         with self.requests_lock:
             total_completed = len(self.completed_requests)
-            approved_count = sum(1 for req in self.completed_requests.values()
-                               if req.status == AuthorizationStatus.APPROVED)
-            denied_count = sum(1 for req in self.completed_requests.values()
-                             if req.status == AuthorizationStatus.DENIED)
-            expired_count = sum(1 for req in self.completed_requests.values()
-                              if req.status == AuthorizationStatus.EXPIRED)
+            approved_count = self._completed_status_counts[AuthorizationStatus.APPROVED]
+            denied_count = self._completed_status_counts[AuthorizationStatus.DENIED]
+            expired_count = self._completed_status_counts[AuthorizationStatus.EXPIRED]
 
             return {
                 'pending_requests': len(self.pending_requests),
@@ -9,16 +9,22 @@
 - 审计日志记录
 """
 
-import time
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass
 
 from .policies import SecurityPolicy, OperationPolicy, AgentSecurityPolicy, SecurityContext, OperationType, AuthorizationLevel
-from .authorizer import UserAuthorizer, AuthorizationRequest, AuthorizationStatus
+from .authorizer import UserAuthorizer, AuthorizationRequest, AuthorizationStatus, _DATACLASS_SLOTS
+from ..utils.cache import TTLCache
 
 
-@dataclass
+# 各操作类型的显示名称，如 post_comment -> Post Comment
+_OPERATION_NAMES: Dict[OperationType, str] = {
+    operation_type: operation_type.value.replace('_', ' ').title() for operation_type in OperationType
+}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class PermissionDecision:
     """权限决策结果"""
     allowed: bool
@@ -68,8 +74,16 @@ class PermissionManager:
 
         # 权限决策缓存（可选）
         self.enable_caching = config.get('enable_permission_caching', False)
-        self.permission_cache: Dict[str, PermissionDecision] = {}
         self.cache_ttl = config.get('cache_ttl', 300)  # 5分钟
+        self.permission_cache = TTLCache(maxsize=1024, ttl=self.cache_ttl)
+
+        # 授权级别 -> 处理方法
+        self._level_handlers = {
+            AuthorizationLevel.FORBIDDEN: self._deny_forbidden,
+            AuthorizationLevel.AUTOMATIC: self._allow_automatic,
+            AuthorizationLevel.USER_CONFIRM: self._handle_user_confirmation,
+            AuthorizationLevel.ADMIN_APPROVE: self._require_admin_approval,
+        }
 
         self.logger.info("PermissionManager initialized with strict security policies")
 
@@ -106,7 +120,7 @@ class PermissionManager:
             return decision
 
         except Exception as e:
-            self.logger.error(f"Error in permission check: {e}")
+            self.logger.error("Error in permission check: %s", e)
             # 安全失败 - 默认拒绝
             return PermissionDecision(
                 allowed=False,
@@ -126,37 +140,44 @@ class PermissionManager:
         Returns:
             PermissionDecision: 权限决策
         """
-        if authorization_level == AuthorizationLevel.FORBIDDEN:
-            return PermissionDecision(
-                allowed=False,
-                authorization_level=authorization_level,
-                message=f"Operation {security_context.operation_type.value} is forbidden"
-            )
-
-        elif authorization_level == AuthorizationLevel.AUTOMATIC:
-            return PermissionDecision(
-                allowed=True,
-                authorization_level=authorization_level,
-                message="Operation automatically authorized"
-            )
+        handler = self._level_handlers.get(authorization_level, self._deny_unknown_level)
+        return handler(security_context, authorization_level)
+
+    def _deny_forbidden(self, security_context: SecurityContext,
+                        authorization_level: AuthorizationLevel) -> PermissionDecision:
+        """禁止的操作"""
+        return PermissionDecision(
+            allowed=False,
+            authorization_level=authorization_level,
+            message=f"Operation {security_context.operation_type.value} is forbidden"
+        )
 
-        elif authorization_level == AuthorizationLevel.USER_CONFIRM:
-            return self._handle_user_confirmation(security_context, authorization_level)
+    def _allow_automatic(self, security_context: SecurityContext,
+                         authorization_level: AuthorizationLevel) -> PermissionDecision:
+        """自动授权的操作"""
+        return PermissionDecision(
+            allowed=True,
+            authorization_level=authorization_level,
+            message="Operation automatically authorized"
+        )
 
-        elif authorization_level == AuthorizationLevel.ADMIN_APPROVE:
-            return PermissionDecision(
-                allowed=False,
-                authorization_level=authorization_level,
-                message="Admin approval required (not implemented)"
-            )
+    def _require_admin_approval(self, security_context: SecurityContext,
+                                authorization_level: AuthorizationLevel) -> PermissionDecision:
+        """需要管理员审批的操作（尚未实现，拒绝）"""
+        return PermissionDecision(
+            allowed=False,
+            authorization_level=authorization_level,
+            message="Admin approval required (not implemented)"
+        )
 
-        else:
-            # 未知授权级别 - 默认拒绝
-            return PermissionDecision(
-                allowed=False,
-                authorization_level=AuthorizationLevel.FORBIDDEN,
-                message=f"Unknown authorization level: {authorization_level}"
-            )
+    def _deny_unknown_level(self, security_context: SecurityContext,
+                            authorization_level: AuthorizationLevel) -> PermissionDecision:
+        """未知授权级别 - 默认拒绝"""
+        return PermissionDecision(
+            allowed=False,
+            authorization_level=AuthorizationLevel.FORBIDDEN,
+            message=f"Unknown authorization level: {authorization_level}"
+        )
 
     def _handle_user_confirmation(self, security_context: SecurityContext,
                                 authorization_level: AuthorizationLevel) -> PermissionDecision:
@@ -191,7 +212,7 @@ class PermissionManager:
             )
 
         except Exception as e:
-            self.logger.error(f"Failed to create authorization request: {e}")
+            self.logger.error("Failed to create authorization request: %s", e)
             return PermissionDecision(
                 allowed=False,
                 authorization_level=AuthorizationLevel.FORBIDDEN,
@@ -229,7 +250,7 @@ class PermissionManager:
                 )
 
         except Exception as e:
-            self.logger.error(f"Error waiting for user authorization: {e}")
+            self.logger.error("Error waiting for user authorization: %s", e)
             return PermissionDecision(
                 allowed=False,
                 authorization_level=AuthorizationLevel.FORBIDDEN,
@@ -265,14 +286,14 @@ class PermissionManager:
             success = response.status == AuthorizationStatus.APPROVED
 
             if success:
-                self.logger.info(f"Authorization {request_id} approved by {approved_by}")
+                self.logger.info("Authorization %s approved by %s", request_id, approved_by)
             else:
-                self.logger.warning(f"Failed to approve authorization {request_id}: {response.message}")
+                self.logger.warning("Failed to approve authorization %s: %s", request_id, response.message)
 
             return success
 
         except Exception as e:
-            self.logger.error(f"Error approving authorization {request_id}: {e}")
+            self.logger.error("Error approving authorization %s: %s", request_id, e)
             return False
 
     def deny_authorization(self, request_id: str, denied_by: str, reason: str = "") -> bool:
@@ -292,14 +313,14 @@ class PermissionManager:
             success = response.status == AuthorizationStatus.DENIED
 
             if success:
-                self.logger.info(f"Authorization {request_id} denied by {denied_by}: {reason}")
+                self.logger.info("Authorization %s denied by %s: %s", request_id, denied_by, reason)
             else:
-                self.logger.warning(f"Failed to deny authorization {request_id}: {response.message}")
+                self.logger.warning("Failed to deny authorization %s: %s", request_id, response.message)
 
             return success
 
         except Exception as e:
-            self.logger.error(f"Error denying authorization {request_id}: {e}")
+            self.logger.error("Error denying authorization %s: %s", request_id, e)
             return False
 
     def validate_agent_operation(self, operation_type: OperationType,
@@ -329,7 +350,7 @@ class PermissionManager:
 
     def _generate_authorization_description(self, security_context: SecurityContext) -> str:
         """生成授权描述"""
-        operation_name = security_context.operation_type.value.replace('_', ' ').title()
+        operation_name = _OPERATION_NAMES[security_context.operation_type]
 
         if security_context.resource_path:
             return f"{operation_name}: {security_context.resource_path}"
@@ -350,36 +371,22 @@ class PermissionManager:
     def _log_permission_decision(self, security_context: SecurityContext, decision: PermissionDecision):
         """记录权限决策"""
         self.logger.info(
-            f"Permission decision: user={security_context.user_id}, "
-            f"operation={security_context.operation_type.value}, "
-            f"allowed={decision.allowed}, "
-            f"level={decision.authorization_level.value}, "
-            f"request_id={decision.request_id}"
+            "Permission decision: user=%s, operation=%s, allowed=%s, level=%s, request_id=%s",
+            security_context.user_id, security_context.operation_type.value, decision.allowed,
+            decision.authorization_level.value, decision.request_id
         )
 
-    def _get_cache_key(self, security_context: SecurityContext) -> str:
-        """生成缓存键"""
-        return f"{security_context.user_id}:{security_context.operation_type.value}:{security_context.resource_path}"
+    def _get_cache_key(self, security_context: SecurityContext) -> Tuple:
+        """生成缓存键，元组无需格式化字符串"""
+        return (security_context.user_id, security_context.operation_type, security_context.resource_path)
 
     def _get_cached_decision(self, security_context: SecurityContext) -> Optional[PermissionDecision]:
-        """获取缓存的决策"""
-        cache_key = self._get_cache_key(security_context)
-        cached = self.permission_cache.get(cache_key)
-
-        if cached and time.time() - cached.metadata.get('cached_at', 0) < self.cache_ttl:
-            return cached
-
-        # 清理过期缓存
-        if cached:
-            del self.permission_cache[cache_key]
-
-        return None
+        """获取缓存的决策，过期条目由TTLCache在读取时清除"""
+        return self.permission_cache.get(self._get_cache_key(security_context))
 
     def _cache_decision(self, security_context: SecurityContext, decision: PermissionDecision):
         """缓存权限决策"""
-        cache_key = self._get_cache_key(security_context)
-        decision.metadata['cached_at'] = time.time()
-        self.permission_cache[cache_key] = decision
+        self.permission_cache.set(self._get_cache_key(security_context), decision)
 
     def get_permission_statistics(self) -> Dict:
         """
@@ -4,6 +4,7 @@ import requests
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 import logging
+from functools import lru_cache
 
 
 @dataclass
@@ -135,12 +136,23 @@ class AICodeAnalyzer:
             # 如果没有配置，使用默认的分析维度
             return self._get_default_analysis_dimensions()
 
-        import json
+        if isinstance(context.review_config, str):
+            return self._dimensions_for_config_json(context.review_config)
+        return self._build_analysis_dimensions(context.review_config)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _dimensions_for_config_json(review_config: str) -> str:
+        """按配置JSON缓存分析维度文本，同一审查的每个文件不再重复解析配置"""
         try:
-            config = json.loads(context.review_config) if isinstance(context.review_config, str) else context.review_config
-        except:
+            config = json.loads(review_config)
+        except ValueError:
             config = {}
+        return AICodeAnalyzer._build_analysis_dimensions(config)
 
+    @staticmethod
+    def _build_analysis_dimensions(config: Dict) -> str:
+        """根据配置字典生成分析维度"""
         dimensions = []
         dimension_count = 0
 
@@ -232,7 +244,7 @@ class AICodeAnalyzer:
 
         # 如果用户没有选择任何选项，使用默认维度
         if not dimensions:
-            return self._get_default_analysis_dimensions()
+            return AICodeAnalyzer._get_default_analysis_dimensions()
 
         # 添加忽略的维度说明
         ignored_checks = []
@@ -264,7 +276,8 @@ class AICodeAnalyzer:
 
         return result
 
-    def _get_default_analysis_dimensions(self) -> str:
+    @staticmethod
+    def _get_default_analysis_dimensions() -> str:
         """获取默认的分析维度"""
         return """1. **安全性 (Security)**:
    - SQL注入、XSS、CSRF等安全漏洞
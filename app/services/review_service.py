@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+import functools
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 
 from .gitlab_client import GitLabClient
@@ -21,9 +24,33 @@ from ..permissions.policies import SecurityContext, OperationType
 # UserConfig和UserConfigManager已废弃，现在使用AuthDatabase
 from ..models.review import ReviewDatabase
 from ..models.auth import AuthDatabase
+from ..utils.cache import TTLCache
+from ..utils import current_user
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 
+# 后台发布评论到GitLab时的最大并发数
+BULK_POST_MAX_WORKERS = 8
+
+# 终态审查记录不再变化，缓存时间可以更长
+TERMINAL_REVIEW_STATUSES = ('completed', 'failed', 'cancelled')
+TERMINAL_CACHE_TTL = 300
+
+# 进度写库的最小间隔（秒）；间隔内的更新只保存在内存中，状态变化时立即写库
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+# 搜索结果缓存时间（秒），新建审查最多延迟这么久出现在搜索结果中
+SEARCH_CACHE_TTL = 60
+
+MR_URL_PATTERN = re.compile(r'https?://[^/]+/.+/-/merge_requests/\d+')
+
+
+@functools.lru_cache(maxsize=512)
+def _is_valid_mr_url(mr_url: str) -> bool:
+    """校验MR URL格式（纯函数，结果可缓存）"""
+    return MR_URL_PATTERN.match(mr_url) is not None
+
 
 class ReviewService:
     def __init__(self, config_manager=None, db_path: str = "temp/reviews.db"):
@@ -35,12 +62,21 @@ class ReviewService:
         # 初始化Agent编排系统
         self._init_agent_orchestration()
 
-        # 进度跟踪存储 (内存中临时存储)
+        # 进度跟踪存储 (内存中临时存储)：review_id -> [进度, 上次写库时间, 是否有未写库的更新]
         self._progress_storage = {}
         self._progress_lock = threading.Lock()
         # 用于跟踪可取消的审查进程
         self._cancellation_flags = {}
         self._cancellation_lock = threading.Lock()
+        # 只读查询结果缓存，避免前端轮询反复查询数据库
+        self._read_cache = TTLCache(maxsize=2048, ttl=15)
+        # 进度变化通知（版本号递增），供SSE推送等待
+        self._progress_condition = threading.Condition()
+        self.progress_version = 0
+        # 后台发布评论到GitLab的线程池，避免阻塞请求线程
+        self._post_executor = ThreadPoolExecutor(
+            max_workers=BULK_POST_MAX_WORKERS, thread_name_prefix='gitlab-post'
+        )
 
     def _setup_logger(self) -> logging.Logger:
         """设置日志记录器"""
@@ -111,7 +147,7 @@ class ReviewService:
             self.logger.info(f"create_review_record called with username: {username}, mr_url: {mr_url}")
 
             # 获取用户信息
-            user = self.auth_db.get_user_by_username(username)
+            user = current_user.get_user_by_username(self.auth_db, username)
             self.logger.info(f"Found user: {user.username if user else 'None'} (ID: {user.id if user else 'None'})")
             if user is None:
                 self.logger.error("User not found")
@@ -207,9 +243,9 @@ class ReviewService:
                 with self._cancellation_lock:
                     self._cancellation_flags[review_id] = False
 
-            # 1. 获取用户信息（重新获取以确保是最新配置）
+            # 1. 获取用户信息（配置变更时会清除用户缓存，缓存中的即为最新配置）
             self.logger.info(f"Starting code review for user {username}, MR: {mr_url}")
-            user = self.auth_db.get_user_by_username(username)
+            user = current_user.get_user_by_username(self.auth_db, username)
             self.logger.info(f"User GitLab URL in perform_review: {user.gitlab_url if user else 'User not found'}")
 
             if user is None:
@@ -598,9 +634,9 @@ class ReviewService:
 
             # 6. 生成评论并保存待确认
             comment_generator = CommentGenerator(user_config.__dict__)
-            comments_prepared = 0
+            issues_to_save = []
 
-            # 为每个问题生成评论文本并保存到数据库
+            # 为每个问题生成评论文本，之后在同一事务中批量保存到数据库
             for issue_record in issue_records:
                 try:
                     issue = issue_record['issue']
@@ -635,18 +671,8 @@ class ReviewService:
                             'comment_text': comment_text
                         }
 
-                    # 保存问题记录到数据库
-                    issue_id = self.db.add_issue_record(review_id, issue_data)
-                    issue_record['issue_id'] = issue_id
-                    comments_prepared += 1
-
-                    # 获取行号用于日志记录
-                    if isinstance(issue, dict):
-                        line_number = issue.get('line_number', 0)
-                    else:
-                        line_number = getattr(issue, 'line_number', 0)
-
-                    self.logger.info(f"Prepared comment for {file_path}:{line_number}")
+                    issues_to_save.append(issue_data)
+                    self.logger.info(f"Prepared comment for {file_path}:{issue_data['line_number']}")
 
                 except Exception as e:
                     # 获取行号用于错误日志记录
@@ -657,6 +683,8 @@ class ReviewService:
 
                     self.logger.error(f"Error preparing comment for {file_path}:{line_number}: {e}")
 
+            comments_prepared = len(self.db.add_issues_bulk(review_id, issues_to_save))
+
             # 统计跳过的文件
             skipped_files = [f for f in analyzed_files if f.get('skipped', False)]
 
@@ -664,10 +692,6 @@ class ReviewService:
             analysis_summary = {
                 'total_files_analyzed': len(analyzed_files),
                 'total_files_skipped': len(skipped_files),
-                'total_issues_found': len(all_issues),
-                'error_count': len([i for i in all_issues if i.severity == 'error']),
-                'warning_count': len([i for i in all_issues if i.severity == 'warning']),
-                'info_count': len([i for i in all_issues if i.severity == 'info']),
                 'comments_prepared': comments_prepared,
                 'comments_posted': 0  # 还没有发布评论
             }
@@ -723,43 +747,98 @@ class ReviewService:
 
     def get_review_details(self, review_id: int) -> Optional[Dict]:
         """获取审查详细信息"""
+        cache_key = ('details', review_id)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         review = self.db.get_review_record(review_id)
         if not review:
             return None
 
+        # 评论是非pending状态的问题子集，从同一次查询结果中筛选，避免重复读取和构造行
         issues = self.db.get_review_issues(review_id)
-        comments = self.db.get_review_comments(review_id)
+        comments = [issue for issue in issues if issue['comment_status'] != 'pending']
 
-        return {
+        details = {
             'review': review,
             'issues': issues,
             'comments': comments
         }
 
+        # 进行中的审查状态随时变化，只缓存终态记录
+        if review['status'] in TERMINAL_REVIEW_STATUSES:
+            self._read_cache.set(cache_key, details, ttl=TERMINAL_CACHE_TTL)
+
+        return details
+
     def get_user_review_history(self, user_id: str, limit: int = 10, offset: int = 0) -> List[Dict]:
         """获取用户的审查历史"""
-        return self.db.get_user_reviews(user_id, limit, offset)
+        cache_key = ('history', user_id, limit, offset)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        reviews = self.db.get_user_reviews(user_id, limit, offset)
+        self._read_cache.set(cache_key, reviews)
+        return reviews
+
+    def get_user_review_count(self, user_id: str) -> int:
+        """获取用户的审查记录总数"""
+        cache_key = ('count', user_id)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        count = self.db.get_reviews_count(user_id)
+        self._read_cache.set(cache_key, count)
+        return count
 
     def get_review_statistics(self, user_id: str = None, days: int = 30) -> Dict:
         """获取审查统计信息"""
-        return self.db.get_review_statistics(user_id, days)
+        cache_key = ('statistics', user_id, days)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        stats = self.db.get_review_statistics(user_id, days)
+        self._read_cache.set(cache_key, stats)
+        return stats
 
     def search_reviews(self, query: str, user_id: str = None, limit: int = 20) -> List[Dict]:
         """搜索审查记录"""
-        return self.db.search_reviews(query, user_id, limit)
+        cache_key = ('search', query, user_id, limit)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        results = self.db.search_reviews(query, user_id, limit)
+        self._read_cache.set(cache_key, results, ttl=SEARCH_CACHE_TTL)
+        return results
 
     def delete_review(self, review_id: int) -> bool:
         """删除审查记录"""
         try:
             self.db.delete_review_record(review_id)
+            self._invalidate_review_cache(review_id)
+            # 列表和统计中也包含该记录
+            self._read_cache.pop_matching(lambda key: key[0] in ('history', 'count', 'statistics', 'search'))
             return True
         except Exception as e:
             self.logger.error(f"Failed to delete review {review_id}: {e}")
             return False
 
-    def export_review_data(self, review_id: int) -> Dict:
-        """导出审查数据"""
-        return self.db.export_review_data(review_id)
+    def export_review_data(self, review_id: int) -> Optional[Tuple[Dict, Iterator[Dict]]]:
+        """导出审查数据，返回(审查记录, 问题迭代器)，问题按需从数据库读取"""
+        review = self.db.get_review_record(review_id)
+        if not review:
+            return None
+        return review, self.db.iter_review_issues(review_id)
+
+    def _invalidate_review_cache(self, review_id: int):
+        """清除单个审查记录相关的缓存"""
+        for kind in ('details', 'result'):
+            self._read_cache.pop((kind, review_id))
 
     def get_pending_comments(self, review_id: int, include_context: bool = False) -> List[Dict]:
         """获取待确认的评论"""
@@ -821,10 +900,10 @@ class ReviewService:
             user = None
             if review['user_id'].isdigit():
                 # 如果是数字，作为用户ID查询
-                user = self.auth_db.get_user_by_id(int(review['user_id']))
+                user = current_user.get_user_by_id(self.auth_db, int(review['user_id']))
             else:
                 # 如果是字符串，作为用户名查询
-                user = self.auth_db.get_user_by_username(review['user_id'])
+                user = current_user.get_user_by_username(self.auth_db, review['user_id'])
 
             if not user or not user.gitlab_url or not user.access_token:
                 self.logger.warning(f"User or GitLab config missing for user: {review['user_id']}")
@@ -982,7 +1061,7 @@ class ReviewService:
                     return None
 
             # 获取用户配置
-            user = self.auth_db.get_user_by_username(review['user_id'])
+            user = current_user.get_user_by_username(self.auth_db, review['user_id'])
             if not user or not user.gitlab_url or not user.access_token:
                 return None
 
@@ -1048,114 +1127,120 @@ class ReviewService:
             self.logger.error(f"Error getting code context: {e}")
             return None
 
+    def _get_gitlab_post_target(self, review_id: int) -> Tuple[Dict, GitLabClient]:
+        """获取发布评论所需的审查记录和GitLab客户端，配置缺失时抛出ValueError"""
+        review = self.db.get_review_record(review_id)
+        if not review:
+            raise ValueError('审查记录不存在')
+
+        # 从数据库获取用户配置 (user_id存储的是用户名)
+        user = current_user.get_user_by_username(self.auth_db, review['user_id'])
+        if not user:
+            raise ValueError(f'用户不存在: {review["user_id"]}')
+
+        if not user.gitlab_url or not user.access_token:
+            raise ValueError(f'GitLab配置缺失: {user.username}')
+
+        return review, GitLabClient(user.gitlab_url, user.access_token)
+
+    def _post_comment_to_gitlab(self, review: Dict, gitlab_client: GitLabClient, issue: Dict) -> bool:
+        """发布单条已确认评论到GitLab（在后台线程执行）"""
+        issue_id = issue['id']
+        success = False
+        try:
+            success = gitlab_client.add_mr_comment(
+                review['project_id'],
+                review['mr_iid'],
+                issue['comment_text'],
+                issue['file_path'],
+                issue['line_number']
+            )
+            if not success:
+                self.logger.error(f"Failed to post comment to GitLab for issue {issue_id}")
+        except Exception as e:
+            self.logger.error(f"Error posting comment {issue_id} to GitLab: {e}")
+
+        # 发布结果（评论状态和comments_posted计数）由后台写线程与其他评论合并提交，提交后再清除缓存
+        write = self.db.record_comment_post_result(
+            review['id'], issue_id, "posted" if success else None,
+            on_commit=functools.partial(self._invalidate_review_cache, review['id'])
+        )
+        write.add_done_callback(functools.partial(self._log_comment_result_write, issue_id, success))
+        return success
+
+    def _log_comment_result_write(self, issue_id: int, posted: bool, write):
+        """后台写入评论发布结果失败时记录日志（评论状态未更新）"""
+        error = write.exception()
+        if error is not None:
+            self.logger.error(f"Failed to record {'posted' if posted else 'failed'} status "
+                              f"for comment {issue_id}: {error}")
+
     def confirm_comment(self, review_id: int, issue_id: int) -> bool:
-        """确认并发布单个评论"""
+        """确认单个评论，GitLab发布在后台执行"""
         try:
             # 获取问题详情
             issue = self._get_issue_by_id(issue_id)
             if not issue or issue['review_id'] != review_id:
                 return False
 
-            # 如果已经确认，先发布到GitLab
-            if self.db.confirm_comment(issue_id):
-                # 获取审查信息
-                review = self.db.get_review_record(review_id)
-                if not review:
-                    self.logger.error(f"Review record not found for review_id: {review_id}")
-                    return False
-
-                # 从数据库获取用户配置 (user_id存储的是用户名)
-                user = self.auth_db.get_user_by_username(review['user_id'])
-                if not user:
-                    self.logger.error(f"User not found for username: {review['user_id']}")
-                    return False
-
-                if not user.gitlab_url or not user.access_token:
-                    self.logger.error(f"GitLab configuration missing for user: {user.username}")
-                    return False
-
-                # 发布评论到GitLab
-                gitlab_client = GitLabClient(user.gitlab_url, user.access_token)
-                success = gitlab_client.add_mr_comment(
-                    review['project_id'],
-                    review['mr_iid'],
-                    issue['comment_text'],
-                    issue['file_path'],
-                    issue['line_number']
-                )
+            try:
+                review, gitlab_client = self._get_gitlab_post_target(review_id)
+            except ValueError as e:
+                self.logger.error(f"Cannot post comment for review {review_id}: {e}")
+                return False
 
-                if success:
-                    self.db.update_comment_gitlab_id(issue_id, "posted")
-                    # 更新审查记录中的comments_posted计数
-                    issue = self._get_issue_by_id(issue_id)
-                    if issue:
-                        self.db.update_comments_posted_count(issue['review_id'], 1)
-                    return True
-                else:
-                    self.logger.error(f"Failed to post comment to GitLab for issue {issue_id}")
-                    return False
+            if not self.db.confirm_comment(issue_id):
+                return False
 
-            return False
+            # 状态为confirmed表示正在发布，完成后变为posted或post_failed
+            self._post_executor.submit(self._post_comment_to_gitlab, review, gitlab_client, issue)
+            return True
         except Exception as e:
             self.logger.error(f"Error confirming comment {issue_id}: {e}")
             return False
+        finally:
+            self._invalidate_review_cache(review_id)
 
-    def reject_comment(self, issue_id: int) -> bool:
+    def reject_comment(self, issue_id: int, review_id: int = None) -> bool:
         """拒绝评论"""
-        return self.db.reject_comment(issue_id)
+        success = self.db.reject_comment(issue_id)
+        if success and review_id is not None:
+            self._invalidate_review_cache(review_id)
+        return success
 
     def bulk_confirm_comments(self, review_id: int, issue_ids: List[int]) -> Dict:
-        """批量确认评论"""
+        """批量确认评论，GitLab发布在后台并行执行"""
         try:
-            # 确认评论
-            confirmed_count = self.db.bulk_confirm_comments(issue_ids)
-
-            # 获取审查信息
-            review = self.db.get_review_record(review_id)
-            if not review:
-                return {'success': False, 'error': '审查记录不存在'}
-
-            # 从数据库获取用户配置 (user_id存储的是用户名)
-            user = self.auth_db.get_user_by_username(review['user_id'])
-            if not user:
-                return {'success': False, 'error': f'用户不存在: {review["user_id"]}'}
-
-            if not user.gitlab_url or not user.access_token:
-                return {'success': False, 'error': f'GitLab配置缺失: {user.username}'}
+            try:
+                review, gitlab_client = self._get_gitlab_post_target(review_id)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
 
-            gitlab_client = GitLabClient(user.gitlab_url, user.access_token)
-            posted_count = 0
-
-            # 发布确认的评论到GitLab
-            for issue_id in issue_ids:
-                issue = self._get_issue_by_id(issue_id)
-                if issue and issue['comment_status'] == 'confirmed':
-                    success = gitlab_client.add_mr_comment(
-                        review['project_id'],
-                        review['mr_iid'],
-                        issue['comment_text'],
-                        issue['file_path'],
-                        issue['line_number']
-                    )
+            # 只发布本次调用确认的评论；其他请求已确认的评论由其自身发布，避免重复评论
+            confirmed_ids = self.db.bulk_confirm_comments(review_id, issue_ids)
+            self._invalidate_review_cache(review_id)
 
-                    if success:
-                        self.db.update_comment_gitlab_id(issue_id, "posted")
-                        posted_count += 1
+            # 一次查询取回本次确认的评论
+            issues = self.db.get_issues_by_ids(confirmed_ids)
 
-            # 更新审查记录中的comments_posted计数
-            if posted_count > 0:
-                self.db.update_comments_posted_count(review_id, posted_count)
+            # 提交到后台线程池并行发布，重叠网络等待时间
+            for issue in issues:
+                self._post_executor.submit(self._post_comment_to_gitlab, review, gitlab_client, issue)
 
             return {
                 'success': True,
-                'confirmed_count': confirmed_count,
-                'posted_count': posted_count
+                'confirmed_count': len(confirmed_ids),
+                'queued_count': len(issues)
             }
 
         except Exception as e:
             self.logger.error(f"Error bulk confirming comments: {e}")
             return {'success': False, 'error': str(e)}
 
+    def get_comment_statuses(self, review_id: int) -> List[Dict]:
+        """获取已处理评论的发布状态"""
+        return self.db.get_comment_statuses(review_id)
+
     def _get_issue_by_id(self, issue_id: int) -> Optional[Dict]:
         """根据ID获取问题详情"""
         conn = self.db.db_path
@@ -1307,9 +1392,8 @@ class ReviewService:
 
     def validate_mr_url(self, mr_url: str) -> Tuple[bool, Optional[str]]:
         """验证MR URL格式"""
-        import re
-        pattern = r'https?://[^/]+/.+/-/merge_requests/\d+'
-        if re.match(pattern, mr_url):
+        # 前端输入时实时校验，提交时再次校验，共用同一份缓存
+        if _is_valid_mr_url(mr_url):
             return True, None
         else:
             return False, "MR URL格式不正确，应该类似：https://gitlab.com/group/project/-/merge_requests/123"
@@ -1360,16 +1444,74 @@ class ReviewService:
     def _init_progress(self, review_id: int, total_files: int):
         """初始化审查进度"""
         self.db.init_review_progress(review_id, total_files)
+        progress = {
+            'review_id': review_id,
+            'status': 'analyzing',
+            'total_files': total_files,
+            'processed_files': 0,
+            'total_issues': 0,
+            'current_file': None,
+            'last_update': datetime.now().isoformat(timespec='milliseconds')
+        }
+        with self._progress_lock:
+            self._progress_storage[review_id] = [progress, time.monotonic(), False]
+        self.notify_progress_changed()
         self.logger.info(f"Initialized progress for review {review_id} with {total_files} files")
 
     def _update_progress(self, review_id: int, status: str, processed_files: int, total_issues: int, current_file: str = None):
-        """更新审查进度"""
-        self.db.update_review_progress(review_id, status, processed_files, total_issues, current_file)
+        """更新审查进度，内存中立即可见，写库按PROGRESS_FLUSH_INTERVAL节流"""
+        now = time.monotonic()
+        with self._progress_lock:
+            entry = self._progress_storage.get(review_id)
+            if entry is None:
+                flush = True
+            else:
+                previous, flushed_at, _ = entry
+                # 复制后替换，读取方拿到的进度字典不会被并发修改
+                progress = dict(previous, status=status, processed_files=processed_files,
+                                total_issues=total_issues, current_file=current_file,
+                                last_update=datetime.now().isoformat(timespec='milliseconds'))
+                flush = status != previous['status'] or now - flushed_at >= PROGRESS_FLUSH_INTERVAL
+                entry[:] = [progress, now if flush else flushed_at, not flush]
+
+        if flush:
+            self.db.update_review_progress(review_id, status, processed_files, total_issues, current_file)
+        self.notify_progress_changed()
         self.logger.info(f"Progress updated for review {review_id}: {processed_files} files processed, {total_issues} issues, current: {current_file}")
 
+    def flush_review_progress(self, review_id: int):
+        """将内存中尚未写库的最新进度写入数据库，并释放内存中的进度"""
+        with self._progress_lock:
+            entry = self._progress_storage.pop(review_id, None)
+
+        if entry is not None and entry[2]:
+            progress = entry[0]
+            self.db.update_review_progress(
+                review_id, progress['status'], progress['processed_files'],
+                progress['total_issues'], progress['current_file']
+            )
+
+    def notify_progress_changed(self):
+        """通知等待进度变化的订阅者"""
+        with self._progress_condition:
+            self.progress_version += 1
+            self._progress_condition.notify_all()
+
+    def wait_for_progress_change(self, seen_version: int, timeout: float) -> bool:
+        """等待进度版本号超过seen_version，超时返回False"""
+        with self._progress_condition:
+            return self._progress_condition.wait_for(
+                lambda: self.progress_version != seen_version, timeout
+            )
+
     def get_review_progress(self, review_id: int) -> Optional[Dict]:
         """获取审查进度"""
-        # 首先从进度表获取
+        # 进行中的审查优先使用内存中的最新进度，其次从进度表获取
+        with self._progress_lock:
+            entry = self._progress_storage.get(review_id)
+        if entry is not None:
+            return dict(entry[0])
+
         progress = self.db.get_review_progress(review_id)
         if progress:
             # 降低日志级别，减少频繁查询的日志输出
@@ -1412,6 +1554,11 @@ class ReviewService:
 
     def get_review_final_result(self, review_id: int) -> Optional[Dict]:
         """获取审查最终结果"""
+        cache_key = ('result', review_id)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         review = self.db.get_review_record(review_id)
         if not review:
             return None
@@ -1420,7 +1567,7 @@ class ReviewService:
             return None
 
         # 获取待确认评论数量
-        pending_comments = self.db.get_pending_comments(review_id)
+        pending_count = self.db.count_pending_comments(review_id)
 
         # 计算审查耗时
         duration_seconds = self._calculate_review_duration(review)
@@ -1428,7 +1575,7 @@ class ReviewService:
         # 构造结果数据
         result = {
             'review_id': review_id,
-            'pending_comments_count': len(pending_comments),
+            'pending_comments_count': pending_count,
             'duration_seconds': duration_seconds,  # 审查耗时（秒）
             'mr_info': {
                 'title': review.get('mr_title'),
@@ -1449,8 +1596,11 @@ class ReviewService:
         }
 
         # 清理进度记录
+        with self._progress_lock:
+            self._progress_storage.pop(review_id, None)
         self.db.delete_review_progress(review_id)
 
+        self._read_cache.set(cache_key, result, ttl=TERMINAL_CACHE_TTL)
         return result
 
     def cancel_review(self, review_id: int) -> bool:
@@ -1476,7 +1626,10 @@ class ReviewService:
 
             if success:
                 # 清理进度记录
+                with self._progress_lock:
+                    self._progress_storage.pop(review_id, None)
                 self.db.delete_review_progress(review_id)
+                self.notify_progress_changed()
                 self.logger.info(f"Review {review_id} successfully cancelled")
 
                 # 清理取消标志
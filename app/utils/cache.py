@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """带过期时间的线程安全LRU缓存"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        """
+        初始化缓存
+        :param maxsize: 最大缓存条目数，超出时淘汰最久未使用的条目
+        :param ttl: 默认过期时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，过期或不存在时返回default"""
+        with self.lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存值，可单独指定过期时间"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """移除并返回缓存值"""
+        with self.lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """移除所有key满足条件的条目，返回移除数量"""
+        with self.lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def pop_values(self, predicate: Callable[[Any], bool]) -> int:
+        """移除所有值满足条件的条目，返回移除数量"""
+        with self.lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._data)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': f"{(self.hits / total) * 100:.1f}%" if total else "0.0%"
+            }
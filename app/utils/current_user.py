@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from typing import Collection, Optional
+
+from flask import g, session
+
+from .cache import TTLCache
+
+# 已登录用户记录缓存：user_id 或 ('username', username) -> User，
+# 资料、配置或状态变更时需调用invalidate_user
+_user_cache = TTLCache(maxsize=4096, ttl=60)
+
+
+def get_current_user(auth_db) -> Optional[object]:
+    """获取当前会话的用户，同一请求内只解析一次，跨请求复用缓存"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+
+    if 'current_user' in g:
+        return g.current_user
+
+    g.current_user = get_user_by_id(auth_db, user_id)
+    return g.current_user
+
+
+def get_user_by_id(auth_db, user_id: int) -> Optional[object]:
+    """按ID获取用户（含GitLab配置），命中缓存时不查询数据库"""
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = auth_db.get_user_by_id(user_id)
+        if user is not None:
+            _user_cache.set(user_id, user)
+    return user
+
+
+def get_user_by_username(auth_db, username: str) -> Optional[object]:
+    """按用户名获取用户（含GitLab配置），供后台审查和评论发布等无会话场景复用缓存"""
+    key = ('username', username)
+    user = _user_cache.get(key)
+    if user is None:
+        user = auth_db.get_user_by_username(username)
+        if user is not None:
+            _user_cache.set(key, user)
+    return user
+
+
+def invalidate_user(user_id: int):
+    """用户资料、状态或角色变更后清除缓存"""
+    evict_users((user_id,))
+    if 'current_user' in g:
+        g.pop('current_user')
+
+
+def evict_users(user_ids: Collection[int]):
+    """从跨请求缓存中移除指定用户，不访问请求上下文，可在后台线程调用"""
+    # 同一用户可能同时以ID和用户名缓存
+    _user_cache.pop_values(lambda user: user.id in user_ids)
@@ -2,8 +2,9 @@
 import sqlite3
 import threading
 import logging
+from pathlib import Path
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Optional
 import queue
 import time
 
@@ -11,8 +12,9 @@ import time
 class DatabaseConnectionManager:
     """数据库连接池管理器，优化并发访问"""
 
-    def __init__(self, db_path: str, max_connections: int = 10, timeout: int = 30):
+    def __init__(self, db_path: str, max_connections: int = 10, timeout: int = 30, read_only: bool = False):
         self.db_path = db_path
+        self.read_only = read_only
         self.max_connections = max_connections
         self.timeout = timeout
         self.pool = queue.Queue(maxsize=max_connections)
@@ -38,15 +40,24 @@ class DatabaseConnectionManager:
     def _create_connection(self) -> sqlite3.Connection:
         """创建新的数据库连接"""
         try:
+            if self.read_only:
+                # 只读连接：WAL模式下读取一致的快照，不参与写锁竞争
+                database, uri = Path(self.db_path).absolute().as_uri() + '?mode=ro', True
+            else:
+                database, uri = self.db_path, False
+
             conn = sqlite3.connect(
-                self.db_path,
+                database,
                 timeout=self.timeout,
-                check_same_thread=False  # 允许跨线程使用
+                check_same_thread=False,  # 允许跨线程使用
+                cached_statements=512,  # 长连接缓存更多已编译语句，减少重复解析
+                uri=uri
             )
 
             # 优化SQLite设置
-            conn.execute("PRAGMA journal_mode=WAL")  # WAL模式支持并发读取
-            conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
+            if not self.read_only:
+                conn.execute("PRAGMA journal_mode=WAL")  # WAL模式支持并发读取
+                conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
             conn.execute("PRAGMA cache_size=10000")  # 增大缓存
             conn.execute("PRAGMA temp_store=MEMORY")  # 临时表存储在内存中
             conn.execute("PRAGMA mmap_size=268435456")  # 启用内存映射
@@ -60,25 +71,22 @@ class DatabaseConnectionManager:
             return None
 
     def _get_connection(self) -> sqlite3.Connection:
-        """从连接池获取连接"""
+        """从连接池获取连接：优先复用空闲连接，没有空闲时在上限内新建，达到上限后才等待归还"""
         try:
-            # 尝试从池中获取连接
-            try:
-                conn = self.pool.get(timeout=5)
-                # 检查连接是否有效
+            # 取出空闲连接，不等待
+            while True:
+                try:
+                    conn = self.pool.get_nowait()
+                except queue.Empty:
+                    break
+
                 if self._is_connection_valid(conn):
                     return conn
-                else:
-                    # 连接无效，关闭并创建新连接
-                    try:
-                        conn.close()
-                    except:
-                        pass
-                    self.active_connections -= 1
-            except queue.Empty:
-                pass
 
-            # 如果池中没有可用连接，尝试创建新连接
+                # 连接无效，关闭后继续取下一个
+                self._discard_connection(conn)
+
+            # 池中没有空闲连接，未达上限时直接创建新连接
             with self.lock:
                 if self.active_connections < self.max_connections:
                     conn = self._create_connection()
@@ -86,16 +94,17 @@ class DatabaseConnectionManager:
                         self.active_connections += 1
                         return conn
 
-                # 等待可用连接
-                try:
-                    conn = self.pool.get(timeout=self.timeout)
-                    if self._is_connection_valid(conn):
-                        return conn
-                    else:
-                        self.active_connections -= 1
-                        raise sqlite3.OperationalError("Connection is not valid")
-                except queue.Empty:
-                    raise sqlite3.OperationalError("Database connection pool timeout")
+            # 已达上限，等待其他调用归还连接（不持有锁，归还和新建不受阻塞）
+            try:
+                conn = self.pool.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError("Database connection pool timeout")
+
+            if self._is_connection_valid(conn):
+                return conn
+
+            self._discard_connection(conn)
+            raise sqlite3.OperationalError("Connection is not valid")
 
         except Exception as e:
             self.logger.error(f"Failed to get database connection: {e}")
@@ -110,25 +119,23 @@ class DatabaseConnectionManager:
                 self.pool.put(conn, timeout=1)
             except queue.Full:
                 # 连接池已满，关闭连接
-                try:
-                    conn.close()
-                    self.active_connections -= 1
-                except:
-                    pass
+                self._discard_connection(conn)
             except Exception as e:
                 self.logger.error(f"Error returning connection to pool: {e}")
-                try:
-                    conn.close()
-                    self.active_connections -= 1
-                except:
-                    pass
+                self._discard_connection(conn)
         else:
-            # 连接无效，减少活动连接计数
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
+            # 连接无效，关闭并减少活动连接计数
+            self._discard_connection(conn)
+
+    def _discard_connection(self, conn: Optional[sqlite3.Connection]):
+        """关闭不再使用的连接并释放其占用的名额；计数在锁内更新，
+        请求线程和后台线程（登录计数刷新、会话清理、批量写入）并发归还时不会算错"""
+        if conn:
+            try:
+                conn.close()
+            except:
+                pass
+        with self.lock:
             self.active_connections -= 1
 
     def _is_connection_valid(self, conn: sqlite3.Connection) -> bool:
@@ -219,31 +226,43 @@ class DatabaseConnectionManager:
         }
 
 
-# 全局连接池实例
-_auth_db_manager = None
-_review_db_manager = None
+# 全局连接池实例（按数据库路径和是否只读共享）
+_db_managers = {}
+_db_managers_lock = threading.Lock()
+
+
+def get_db_manager(db_path: str) -> DatabaseConnectionManager:
+    """获取指定数据库的连接管理器，同一路径共享一个连接池"""
+    return _get_shared_manager(db_path, read_only=False)
+
+
+def get_read_db_manager(db_path: str) -> DatabaseConnectionManager:
+    """获取指定数据库的只读连接池，查询不占用读写连接池，数据库文件必须已存在"""
+    return _get_shared_manager(db_path, read_only=True)
+
+
+def _get_shared_manager(db_path: str, read_only: bool) -> DatabaseConnectionManager:
+    """按(路径, 是否只读)获取或创建共享连接池"""
+    with _db_managers_lock:
+        manager = _db_managers.get((db_path, read_only))
+        if manager is None:
+            manager = DatabaseConnectionManager(db_path, read_only=read_only)
+            _db_managers[(db_path, read_only)] = manager
+        return manager
 
 
 def get_auth_db_manager() -> DatabaseConnectionManager:
     """获取认证数据库连接管理器"""
-    global _auth_db_manager
-    if _auth_db_manager is None:
-        _auth_db_manager = DatabaseConnectionManager('temp/auth.db')
-    return _auth_db_manager
+    return get_db_manager('temp/auth.db')
 
 
 def get_review_db_manager() -> DatabaseConnectionManager:
     """获取审查数据库连接管理器"""
-    global _review_db_manager
-    if _review_db_manager is None:
-        _review_db_manager = DatabaseConnectionManager('temp/reviews.db')
-    return _review_db_manager
+    return get_db_manager('temp/reviews.db')
 
 
 def close_all_connections():
     """关闭所有数据库连接"""
-    global _auth_db_manager, _review_db_manager
-    if _auth_db_manager:
-        _auth_db_manager.close_all()
-    if _review_db_manager:
-        _review_db_manager.close_all()
\ No newline at end of file
+    with _db_managers_lock:
+        for manager in _db_managers.values():
+            manager.close_all()
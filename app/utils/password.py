@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import hmac
+import base64
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+PBKDF2_ITERATIONS = 100000
+PBKDF2_DKLEN = 32
+
+# 新密码使用scrypt（内存困难），存储格式 scrypt$n$r$p$salt$hash；
+# 旧格式 salt:hash 为PBKDF2-SHA256，仍可校验，登录成功后升级
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+_SCRYPT_PREFIX = f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$'
+
+
+def _load_fastpbkdf2():
+    """加载可选的fastpbkdf2共享库，系统中不存在时返回None"""
+    path = ctypes.util.find_library('fastpbkdf2')
+    if not path:
+        return None
+
+    try:
+        func = ctypes.CDLL(path).fastpbkdf2_hmac_sha256
+    except (OSError, AttributeError) as e:
+        logger.warning("Failed to load fastpbkdf2 from %s: %s", path, e)
+        return None
+
+    # void fastpbkdf2_hmac_sha256(pw, npw, salt, nsalt, iterations, out, nout)
+    func.argtypes = [
+        ctypes.c_char_p, ctypes.c_size_t,
+        ctypes.c_char_p, ctypes.c_size_t,
+        ctypes.c_uint32,
+        ctypes.c_char_p, ctypes.c_size_t,
+    ]
+    func.restype = None
+    return func
+
+
+_fastpbkdf2_hmac_sha256 = _load_fastpbkdf2()
+
+
+def pbkdf2_sha256(password: bytes, salt: bytes, iterations: int = PBKDF2_ITERATIONS) -> bytes:
+    """PBKDF2-HMAC-SHA256，优先使用fastpbkdf2，否则使用hashlib（OpenSSL实现）"""
+    # 两种实现在计算期间都会释放GIL，并发登录在多个请求线程中可以多核并行计算
+    if _fastpbkdf2_hmac_sha256 is None:
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+
+    out = ctypes.create_string_buffer(PBKDF2_DKLEN)
+    _fastpbkdf2_hmac_sha256(password, len(password), salt, len(salt), iterations, out, PBKDF2_DKLEN)
+    return out.raw
+
+
+def hash_password(password: str) -> str:
+    """生成带算法参数前缀的密码哈希"""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return f"{_SCRYPT_PREFIX}{base64.b64encode(salt).decode()}${digest.hex()}"
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """校验密码，按前缀分派算法，兼容旧的PBKDF2格式"""
+    try:
+        if stored_hash.startswith('scrypt$'):
+            _, n, r, p, salt, expected = stored_hash.split('$')
+            digest = hashlib.scrypt(
+                password.encode(), salt=base64.b64decode(salt),
+                n=int(n), r=int(r), p=int(p), dklen=len(expected) // 2
+            )
+        else:
+            salt, expected = stored_hash.split(':')
+            digest = pbkdf2_sha256(password.encode(), salt.encode())
+
+        # 常量时间比较，避免时序侧信道
+        return hmac.compare_digest(bytes.fromhex(expected), digest)
+    except ValueError:
+        return False
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """哈希是否为旧格式或旧参数，需要在下次登录时升级"""
+    return not stored_hash.startswith(_SCRYPT_PREFIX)